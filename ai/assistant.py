@@ -0,0 +1,154 @@
+"""
+ИИ-гид для 3D-туров: клиент Ollama, описания сцен и системный промпт.
+
+Никакой бизнес-логики Flask здесь нет — create_app() создаёт OllamaClient
+из конфигурации и передаёт его в обработчики.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from monitoring.metrics import observe_llm, record_cache, record_llm_failure
+from tours.schema import CompiledTour, Scene
+
+# Сгенерированные описания сцен: title -> текст (LRU)
+DESCRIPTION_CACHE_SIZE = 1024
+_descriptions: "OrderedDict[str, str]" = OrderedDict()
+_descriptions_lock = threading.Lock()
+
+
+# ---- OLLAMA CLIENT ----
+class OllamaClient:
+    """
+    Чат-запросы к локальной Ollama через общий пул keep-alive соединений.
+    При любой ошибке возвращает пустую строку (ошибка считается в метриках).
+    """
+
+    def __init__(self, url: str, model: str, timeout: float = 60, pool_size: int = 10):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def ask(self, messages: List[Dict[str, str]]) -> str:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False
+        }
+        start = time.perf_counter()
+        try:
+            r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json()
+        except Exception as e:
+            record_llm_failure("ollama", self.model, e)
+            print("OLLAMA ERROR:", e)
+            return ""
+
+        observe_llm(
+            "ollama",
+            self.model,
+            time.perf_counter() - start,
+            prompt_tokens=data.get("prompt_eval_count"),
+            completion_tokens=data.get("eval_count"),
+        )
+        return data.get("message", {}).get("content", "")
+
+
+# ---- SCENE DESCRIPTION GENERATOR ----
+def local_scene_description(scene: Scene) -> Optional[str]:
+    """
+    Описание сцены без обращения к модели: из JSON тура или из кэша
+    ранее сгенерированных. None — значит, нужен describe_scene().
+    """
+    if scene.description:
+        return scene.description
+
+    title = scene.title
+    if not title:
+        return ""
+
+    with _descriptions_lock:
+        cached = _descriptions.get(title)
+        if cached is not None:
+            _descriptions.move_to_end(title)
+    record_cache("scene_description", cached is not None)
+    return cached
+
+
+def describe_scene(scene: Scene, ollama: OllamaClient) -> str:
+    """
+    Генерирует описание моделью и кладёт в кэш. Вызывается, когда
+    local_scene_description() вернул None — повторно кэш не проверяется.
+    """
+    title = scene.title
+    prompt = [
+        {"role": "system",
+         "content": "Ты создаёшь короткие описания локаций для 3D-туров. Пиши только на русском языке."},
+        {"role": "user", "content": f"Опиши локацию '{title}' в 1–2 предложениях."}
+    ]
+
+    desc = ollama.ask(prompt)
+    if desc:
+        with _descriptions_lock:
+            _descriptions[title] = desc
+            while len(_descriptions) > DESCRIPTION_CACHE_SIZE:
+                _descriptions.popitem(last=False)
+    return desc
+
+
+# ---- SYSTEM PROMPT BUILDER ----
+def _navigation(tour: CompiledTour, current_scene: str) -> str:
+    """Куда можно пройти из текущей сцены и откуда в неё попадают."""
+    scene = tour.scenes.get(current_scene) if isinstance(current_scene, str) else None
+    if scene is None:
+        return "нет данных"
+
+    def titles(scene_ids):
+        names = dict.fromkeys(tour.scenes[sid].title or sid for sid in scene_ids)
+        return ", ".join(names) or "—"
+
+    return (
+        f"Отсюда можно пройти: {titles(h.to for h in scene.hotspots)}\n"
+        f"Сюда можно прийти из: {titles(tour.incoming.get(current_scene, ()))}"
+    )
+
+
+def build_system_prompt(tour: CompiledTour, current_scene: str) -> str:
+    scene_list = "\n".join(
+        f"- id: {sid}\n  title: {s.title}\n  description: {s.description}"
+        for sid, s in tour.scenes.items()
+    )
+
+    return f"""
+Ты — профессиональный ИИ-гид кампуса.
+
+Цель: помогать человеку ориентироваться на территории университета, как экскурсовод.
+
+=== ЛОКАЦИИ ===
+{scene_list}
+
+=== ПРАВИЛА ===
+1. Отвечай ТОЛЬКО на чистом русском языке.
+2. Говори кратко — 1–3 предложения.
+3. Если пользователь спрашивает о локации — объясни простыми словами.
+4. Если description пустое — придумай короткое описание.
+5. Не отправляй JSON, просто отвечай словами.
+6. Будь дружелюбным экскурсоводом.
+7. На вопросы «как пройти» и «где я» опирайся на раздел НАВИГАЦИЯ.
+
+Текущая сцена: {current_scene}
+
+=== НАВИГАЦИЯ ===
+{_navigation(tour, current_scene)}
+"""
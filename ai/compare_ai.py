@@ -1,21 +1,70 @@
-import os
-from typing import Dict, Any
+"""
+AI-сравнение университетов через OpenAI.
+
+Никакой бизнес-логики Flask здесь нет — create_app() создаёт OpenAIClient
+из конфигурации и передаёт его в compare_universities().
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
-from dotenv import load_dotenv
 from openai import OpenAI
 
-# Загружаем переменные окружения из .env
-load_dotenv()
+from monitoring.metrics import observe_llm, record_llm_failure
 
-API_KEY = os.getenv("OPENAI_API_KEY")
-MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
-if not API_KEY:
-    raise RuntimeError(
-        "OPENAI_API_KEY не найден. Добавь его в .env или переменные окружения."
-    )
+# ---- OPENAI CLIENT ----
+class OpenAIClient:
+    """
+    Чат-запросы к OpenAI. Клиент SDK создаётся при первом запросе:
+    без OPENAI_API_KEY приложение запускается, а сравнение падает с RuntimeError.
+    """
 
-client = OpenAI(api_key=API_KEY)
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None,
+                 timeout: float = 60, max_retries: int = 1):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client: Optional[OpenAI] = None
+        self._lock = threading.Lock()
+
+    def _sdk(self) -> OpenAI:
+        with self._lock:
+            if self._client is None:
+                if not self.api_key:
+                    raise RuntimeError(
+                        "OPENAI_API_KEY не найден. Добавь его в .env или переменные окружения."
+                    )
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                )
+            return self._client
+
+    def chat(self, messages: List[Dict[str, str]], **params) -> str:
+        start = time.perf_counter()
+        try:
+            response = self._sdk().chat.completions.create(
+                model=self.model, messages=messages, **params
+            )
+        except Exception as exc:
+            record_llm_failure("openai", self.model, exc)
+            raise
+
+        usage = getattr(response, "usage", None)
+        observe_llm(
+            "openai",
+            self.model,
+            time.perf_counter() - start,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+        return response.choices[0].message.content.strip()
 
 
 def _format_university_for_prompt(uni: Dict[str, Any]) -> str:
@@ -75,6 +124,7 @@ def _format_university_for_prompt(uni: Dict[str, Any]) -> str:
 
 def compare_universities(uni1: Dict[str, Any],
                          uni2: Dict[str, Any],
+                         client: OpenAIClient,
                          goal: str | None = None) -> str:
     """
     Основная функция: принимает 2 словаря с данными университетов и
@@ -116,9 +166,8 @@ def compare_universities(uni1: Dict[str, Any],
     user_instruction += "\n\n=== Университет B ===\n"
     user_instruction += uni2_block
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
+    return client.chat(
+        [
             {
                 "role": "system",
                 "content": (
@@ -131,6 +180,3 @@ def compare_universities(uni1: Dict[str, Any],
         temperature=0.3,
         max_tokens=900,
     )
-
-    content = response.choices[0].message.content.strip()
-    return content
\ No newline at end of file
@@ -1,119 +1,193 @@
-import os
+import hashlib
 import json
-import requests
 import re
-from flask import Flask, render_template, request, jsonify
-from dotenv import load_dotenv
+import time
+from flask import Flask, Response, abort, render_template, request, jsonify, send_from_directory, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from config import Config, DevelopmentConfig
 
 # ---- DB IMPORTS ----
 from db.database import (
     init_db,
     get_all_universities,
+    get_data_version,
     get_university_by_id,
     search_universities,
 )
-from ai.compare_ai import compare_universities
-
-
-# ---- SYSTEM CONFIG ----
-load_dotenv()
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TOURS_DIR = os.path.join(BASE_DIR, "data", "tours")
-
-# ---- OLLAMA CONFIG ----
-OLLAMA_URL = "http://localhost:11434/api/chat"
-OLLAMA_MODEL = "qwen2.5:7b"
-
-
-# ---- ASK AI ----
-def ask_ollama(messages):
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": messages,
-        "stream": False
-    }
-    try:
-        r = requests.post(OLLAMA_URL, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-
-        return data.get("message", {}).get("content", "")
-    except Exception as e:
-        print("OLLAMA ERROR:", e)
-        return ""
-
-
-# ---- LOAD TOUR ----
-def load_tour(tour_id):
-    path = os.path.join(TOURS_DIR, f"{tour_id}.json")
-    if not os.path.exists(path):
-        return None
-    return json.load(open(path, "r", encoding="utf-8"))
-
-
-# ---- SCENE DESCRIPTION GENERATOR ----
-def describe_scene(scene):
-    desc = (scene.get("description") or "").strip()
-    if desc:
-        return desc
-
-    title = scene.get("title", "")
-    if not title:
-        return ""
-
-    prompt = [
-        {"role": "system",
-         "content": "Ты создаёшь короткие описания локаций для 3D-туров. Пиши только на русском языке."},
-        {"role": "user", "content": f"Опиши локацию '{title}' в 1–2 предложениях."}
-    ]
-
-    return ask_ollama(prompt)
+from ai.assistant import (
+    OllamaClient,
+    build_system_prompt,
+    describe_scene,
+    local_scene_description,
+)
+from ai.compare_ai import OpenAIClient, compare_universities
+from jobs.queue import JobQueue, QueueFull
+from monitoring.metrics import init_metrics
+from monitoring.profiling import init_profiling, server_timing
+from tours.loader import TourStore
+from tours.tiles import MANIFEST_NAME, TileManifest
+from web.page_cache import PageCache
+from web.ratelimit import LLMGate, Overloaded, RateLimiter, init_ratelimit, make_backend
+
+
+# ---- PRELOAD ----
+def warmup(app):
+    """
+    Прогрев перед приёмом трафика: туры (и ответы /api/tour) в кэш, шаблоны скомпилированы,
+    страницы БД и горячие запросы уже в page cache SQLite.
+    """
+    tours = app.extensions["tour_store"].warm()
+
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+
+    get_all_universities()
+    search_universities("a", limit=10)
+
+    print(f"✔ Прогрев завершён: туров в кэше — {tours}.")
+
+
+def check_llm_timeouts(config):
+    """
+    Самая долгая генерация должна закончиться раньше, чем истечёт её слот
+    в LLMGate (LLM_SLOT_LEASE), иначе слот отдадут другому запросу и
+    одновременных генераций станет больше LLM_MAX_CONCURRENT.
+    """
+    longest = max(
+        # Ответ ассистента: запрос + ретрай на русском в одном слоте
+        config["OLLAMA_TIMEOUT"] * 2,
+        config["OPENAI_TIMEOUT"] * (config["OPENAI_MAX_RETRIES"] + 1),
+    )
+    if longest >= config["LLM_SLOT_LEASE"]:
+        raise ValueError(
+            f"LLM_SLOT_LEASE ({config['LLM_SLOT_LEASE']} с) должен быть больше самой долгой "
+            f"генерации ({longest} с): уменьшите OLLAMA_TIMEOUT/OPENAI_TIMEOUT или увеличьте lease"
+        )
 
 
-# ---- SYSTEM PROMPT BUILDER ----
-def build_system_prompt(tour, current_scene):
-    scenes = tour.get("scenes", {})
-    scene_list = "\n".join(
-        f"- id: {sid}\n  title: {s.get('title')}\n  description: {s.get('description', '')}"
-        for sid, s in scenes.items()
+# ---- BACKGROUND JOBS ----
+def compare_job_key(payload):
+    """Одинаковые сравнения при тех же данных БД — одна задача."""
+    raw = json.dumps(
+        [payload["id1"], payload["id2"], (payload.get("goal") or "").strip().lower(), get_data_version()],
+        ensure_ascii=False,
     )
+    return "compare:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
-    return f"""
-Ты — профессиональный ИИ-гид кампуса.
-
-Цель: помогать человеку ориентироваться на территории университета, как экскурсовод.
 
-=== ЛОКАЦИИ ===
-{scene_list}
+def job_view(job):
+    view = {"job_id": job["id"], "status": job["status"]}
+    if job["status"] == "done":
+        view["result"] = job["result"]
+    elif job["status"] == "failed":
+        # Подробности — в логе и в таблице jobs, клиенту только общий текст
+        view["error"] = "Ошибка при обращении к ИИ"
+    return view
 
-=== ПРАВИЛА ===
-1. Отвечай ТОЛЬКО на чистом русском языке.
-2. Говори кратко — 1–3 предложения.
-3. Если пользователь спрашивает о локации — объясни простыми словами.
-4. Если description пустое — придумай короткое описание.
-5. Не отправляй JSON, просто отвечай словами.
-6. Будь дружелюбным экскурсоводом.
 
-Текущая сцена: {current_scene}
-"""
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 # ========================================================
 #   MAIN APP
 # ========================================================
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.config.from_object(config or Config)
+
+    # IP клиента (лимиты, /metrics, профилирование) — из X-Forwarded-For доверенных прокси
+    proxies = app.config["TRUSTED_PROXIES"]
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
 
     init_db()
+    init_metrics(app, multiprocess_dir=app.config["METRICS_DIR"])
+    init_profiling(app)
+
+    tile_manifest = TileManifest(app.config["TILES_DIR"])
+    tour_store = TourStore(
+        app.config["TOURS_DIR"],
+        app.config["TOUR_CACHE_SIZE"],
+        panoramas_dir=app.config["PANORAMAS_DIR"],
+        strict=app.config["TOURS_STRICT"],
+        tile_manifest=tile_manifest,
+    )
+    ollama = OllamaClient(
+        app.config["OLLAMA_URL"],
+        app.config["OLLAMA_MODEL"],
+        timeout=app.config["OLLAMA_TIMEOUT"],
+        pool_size=app.config["OLLAMA_POOL_SIZE"],
+    )
+    openai_client = OpenAIClient(
+        app.config["OPENAI_API_KEY"],
+        app.config["OPENAI_MODEL"],
+        base_url=app.config["OPENAI_BASE_URL"],
+        timeout=app.config["OPENAI_TIMEOUT"],
+        max_retries=app.config["OPENAI_MAX_RETRIES"],
+    )
+    if not app.config["OPENAI_API_KEY"]:
+        print("ℹ OPENAI_API_KEY не задан — AI-сравнение университетов недоступно.")
+    check_llm_timeouts(app.config)
+    page_cache = PageCache(
+        app.config["PAGE_CACHE_SIZE"],
+        enabled=app.config["PAGE_CACHE_ENABLED"],
+    )
+    # Один backend на бакеты и слоты LLM: с sqlite оба лимита общие для воркеров
+    ratelimit_backend = make_backend(app.config["RATELIMIT_BACKEND"], app.config["RATELIMIT_DB"])
+    limiter = RateLimiter(
+        ratelimit_backend,
+        {
+            "api": (app.config["RATE_API_PER_MIN"], app.config["RATE_API_BURST"]),
+            "llm": (app.config["RATE_LLM_PER_MIN"], app.config["RATE_LLM_BURST"]),
+        },
+        enabled=app.config["RATELIMIT_ENABLED"],
+        key_by=app.config["RATELIMIT_KEY"],
+    )
+    llm_gate = LLMGate(
+        ratelimit_backend,
+        app.config["LLM_MAX_CONCURRENT"],
+        queue_timeout=app.config["LLM_QUEUE_TIMEOUT"],
+        retry_after=app.config["LLM_RETRY_AFTER"],
+        lease=app.config["LLM_SLOT_LEASE"],
+    )
+    llm_guard = init_ratelimit(app, limiter, llm_gate)
+
+    def run_compare_job(payload):
+        uni1 = get_university_by_id(payload["id1"])
+        uni2 = get_university_by_id(payload["id2"])
+        if not uni1 or not uni2:
+            raise LookupError("Университет не найден")
+        return compare_universities(uni1, uni2, openai_client, goal=payload.get("goal"))
+
+    jobs = JobQueue(
+        app.config["JOBS_DB"],
+        {"compare": run_compare_job},
+        workers=app.config["JOBS_WORKERS"],
+        max_pending=app.config["JOBS_MAX_PENDING"],
+        result_ttl=app.config["JOBS_RESULT_TTL"],
+        stale_after=app.config["JOBS_STALE_AFTER"],
+        # Пул задач и так ограничен — ждём слот модели, а не отбрасываем
+        slot=lambda: llm_gate.slot(blocking=True),
+    )
+
+    app.extensions["tour_store"] = tour_store
+    app.extensions["page_cache"] = page_cache
+    app.extensions["tile_manifest"] = tile_manifest
+    app.extensions["ollama"] = ollama
+    app.extensions["openai"] = openai_client
+    app.extensions["jobs"] = jobs
 
     # ==== MAIN WEBSITE ====
 
     @app.route("/")
+    @page_cache.cached("index.html")
     def index():
         return render_template("index.html", active_page="home")
 
     @app.route("/universities")
+    @page_cache.cached("universities.html", get_data_version)
     def universities_page():
         universities = get_all_universities()
         return render_template(
@@ -123,50 +197,59 @@ def create_app():
         )
 
     @app.route("/compare")
+    @page_cache.cached("compare.html")
     def compare_page():
         return render_template("compare.html", active_page="compare")
 
     @app.route("/international")
+    @page_cache.cached("intlprograms.html")
     def intl_programs():
         return render_template("intlprograms.html", active_page="intl")
 
     @app.route("/about")
+    @page_cache.cached("about.html")
     def about():
         return render_template("about.html", active_page="about")
 
     # ==== 3D TOUR ROUTES ====
 
     @app.route("/3d")
+    @page_cache.cached("tours_3d.html", tour_store.version)
     def tours_3d():
-        try:
-            tours = [
-                f.replace(".json", "")
-                for f in os.listdir(TOURS_DIR)
-                if f.lower().endswith(".json")
-            ]
-        except:
-            tours = []
-
+        tours = tour_store.list_ids()
         return render_template("tours_3d.html", tours=tours, active_page="3d")
 
     @app.route("/tour/<tour_id>")
     def tour_page(tour_id):
-        tour = load_tour(tour_id)
+        tour = tour_store.get(tour_id)
         if not tour:
             return "NOT FOUND", 404
 
         return render_template(
             "tour/viewer.html",
             tour_id=tour_id,
-            tour_title=tour.get("title", "")
+            tour_title=tour.title
         )
 
     @app.route("/api/tour/<tour_id>")
     def api_tour(tour_id):
-        tour = load_tour(tour_id)
+        tour = tour_store.get(tour_id)
         if not tour:
             return jsonify({"error": "not found"}), 404
-        return jsonify(tour)
+        body, etag = tour.payload(tile_manifest)
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    @app.route("/tiles/<path:filename>")
+    def tiles(filename):
+        # Имена каталогов — хэш содержимого, поэтому кэшируем «навсегда»
+        if filename == MANIFEST_NAME:
+            abort(404)
+        max_age = app.config["TILES_MAX_AGE"]
+        response = send_from_directory(app.config["TILES_DIR"], filename, max_age=max_age)
+        response.headers["Cache-Control"] = f"public, max-age={max_age}, immutable"
+        return response
 
     # ==== AI ASSISTANT ====
 
@@ -178,49 +261,59 @@ def create_app():
         current_scene = data.get("current_scene")
         user_message = data.get("message", "").strip()
 
-        tour = load_tour(tour_id)
+        with server_timing("tour"):
+            tour = tour_store.get(tour_id)
         if not tour:
             return jsonify({"text": "Тур не найден, попробуй перезагрузить страницу."}), 404
 
-        scenes = tour.get("scenes", {})
-
         # === MINI INFO handler ===
         if user_message in ("_mini_info_", "__mini_info__", "mini_info"):
-            scene = scenes.get(current_scene)
+            scene = tour.scenes.get(current_scene)
             if not scene:
                 return jsonify({"text": "Описание этой локации пока недоступно."})
 
-            title = scene.get("title", "Локация")
-            description = (scene.get("description") or "").strip()
+            # Готовое описание отдаём без модели — даже когда она перегружена
+            description = local_scene_description(scene)
 
-            if not description:
-                description = describe_scene(scene)
+            if description is None:
+                with llm_guard(), server_timing("llm"):
+                    description = describe_scene(scene, ollama)
 
-            return jsonify({"text": description})
+            with server_timing("serialize"):
+                return jsonify({"text": description})
 
         # === BUILD SYSTEM PROMPT ===
-        system_prompt = build_system_prompt(tour, current_scene)
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-
-        # === ASK AI ===
-        answer = ask_ollama(messages)
+        with server_timing("prompt"):
+            system_prompt = build_system_prompt(tour, current_scene)
 
-        # === Anti-Chinese/English Filter ===
-        if not answer or len(re.findall(r"[А-Яа-яЁё]", answer)) < 3:
-            retry = [
-                {"role": "system", "content": "Отвечай ТОЛЬКО на чистом русском языке, как экскурсовод."},
+            messages = [
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_message}
             ]
-            answer = ask_ollama(retry)
 
-        if not answer or len(re.findall(r"[А-Яа-яЁё]", answer)) < 3:
-            answer = "Немного запутался — повтори вопрос, я отвечу на чистом русском 😊"
+        # === ASK AI (один слот модели на ответ вместе с ретраем) ===
+        with llm_guard():
+            with server_timing("llm"):
+                answer = ollama.ask(messages)
+
+            # === Anti-Chinese/English Filter ===
+            with server_timing("filter"):
+                needs_retry = not answer or len(re.findall(r"[А-Яа-яЁё]", answer)) < 3
+
+            if needs_retry:
+                retry = [
+                    {"role": "system", "content": "Отвечай ТОЛЬКО на чистом русском языке, как экскурсовод."},
+                    {"role": "user", "content": user_message}
+                ]
+                with server_timing("llm"):
+                    answer = ollama.ask(retry)
 
-        return jsonify({"text": answer})
+        with server_timing("filter"):
+            if not answer or len(re.findall(r"[А-Яа-яЁё]", answer)) < 3:
+                answer = "Немного запутался — повтори вопрос, я отвечу на чистом русском 😊"
+
+        with server_timing("serialize"):
+            return jsonify({"text": answer})
 
     # ==== API FOR UNIVERSITY COMPARISON ====
 
@@ -248,28 +341,113 @@ def create_app():
         if id1 == id2:
             return jsonify({"error": "Выберите два разных университета"}), 400
 
-        uni1 = get_university_by_id(int(id1))
-        uni2 = get_university_by_id(int(id2))
+        with server_timing("db"):
+            uni1 = get_university_by_id(int(id1))
+            uni2 = get_university_by_id(int(id2))
 
         if not uni1 or not uni2:
             return jsonify({"error": "Университет не найден"}), 404
 
-        try:
-            text = compare_universities(uni1, uni2, goal=goal)
-        except Exception as exc:
-            print("AI error:", exc)
-            return jsonify({"error": "Ошибка при обращении к ИИ"}), 500
-
-        return jsonify({"result": text})
+        # Асинхронный режим: сразу id задачи, результат — через опрос или SSE
+        if data.get("async") or request.args.get("async") == "1":
+            payload = {"id1": uni1["id"], "id2": uni2["id"], "goal": goal}
+            key = compare_job_key(payload)
+
+            # Бюджет "llm" списываем только за новую генерацию
+            job_id = jobs.find("compare", key)
+            if job_id is None:
+                charged = limiter.check("llm")
+                try:
+                    job_id, _ = jobs.submit("compare", payload, key)
+                except QueueFull:
+                    limiter.refund("llm", charged)
+                    raise Overloaded(app.config["LLM_RETRY_AFTER"])
+
+            status_url = url_for("api_job", job_id=job_id)
+            response = jsonify({
+                "job_id": job_id,
+                "status_url": status_url,
+                "events_url": url_for("api_job_events", job_id=job_id),
+            })
+            response.status_code = 202
+            response.headers["Location"] = status_url
+            return response
+
+        with llm_guard():
+            try:
+                with server_timing("llm"):
+                    text = compare_universities(uni1, uni2, openai_client, goal=goal)
+            except Exception as exc:
+                print("AI error:", exc)
+                return jsonify({"error": "Ошибка при обращении к ИИ"}), 500
+
+        with server_timing("serialize"):
+            return jsonify({"result": text})
+
+    @app.get("/api/jobs/<job_id>")
+    def api_job(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Задача не найдена"}), 404
+        return jsonify(job_view(job))
+
+    @app.get("/api/jobs/<job_id>/events")
+    def api_job_events(job_id):
+        # Подключение занимает поток воркера до результата или JOBS_SSE_TIMEOUT:
+        # с gthread/waitress клиентам лучше опрашивать /api/jobs/<id>
+        if jobs.get(job_id) is None:
+            return jsonify({"error": "Задача не найдена"}), 404
+
+        timeout = app.config["JOBS_SSE_TIMEOUT"]
+
+        def stream():
+            deadline = time.monotonic() + timeout
+            last_sent = time.monotonic()
+            last_status = None
+            while True:
+                job = jobs.get(job_id)
+                if job is None:
+                    return
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    last_sent = time.monotonic()
+                    yield sse("status", job_view(job))
+                if last_status in ("done", "failed"):
+                    return
+                if time.monotonic() > deadline:
+                    # Клиент переключится на опрос status_url
+                    yield sse("timeout", {"job_id": job_id})
+                    return
+                if time.monotonic() - last_sent > 15:
+                    # Комментарий-пинг, чтобы прокси не закрыл тихое соединение
+                    last_sent = time.monotonic()
+                    yield ": ping\n\n"
+                time.sleep(0.5)
+
+        return Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     @app.route("/favicon.ico")
     def favicon():
         return "", 204
 
+    if app.config["PRELOAD"]:
+        warmup(app)
+
     return app
 
 
 # ==== RUN APP ====
+# Для разработки. В продакшене — serve.py или gunicorn -c gunicorn.conf.py wsgi:app
 if __name__ == "__main__":
-    app = create_app()
-    app.run(debug=True)
+    # FLASK_DEBUG=1 — DevelopmentConfig: debug и без прогрева
+    app = create_app(DevelopmentConfig if Config.DEBUG else Config)
+    app.run(
+        host=app.config["HOST"],
+        port=app.config["PORT"],
+        debug=app.config["DEBUG"],
+        threaded=True,
+    )
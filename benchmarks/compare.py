@@ -0,0 +1,53 @@
+"""
+Сравнение двух JSON-отчётов benchmarks.run (например, до и после изменений).
+
+    python -m benchmarks.compare old.json new.json
+"""
+
+import argparse
+import json
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return report, {(r["scenario"], r["concurrency"]): r for r in report["results"]}
+
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение отчётов бенчмарка")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args(argv)
+
+    old_report, old = _load(args.old)
+    new_report, new = _load(args.new)
+
+    print(f"old: {old_report['meta'].get('revision')}  new: {new_report['meta'].get('revision')}")
+    print(f"{'scenario':<15} {'c':>4} {'rps old':>9} {'rps new':>9} {'Δ':>7}"
+          f" {'p95 old':>9} {'p95 new':>9} {'Δ':>7} {'p99 Δ':>7} {'srv p50 Δ':>9} {'bytes Δ':>8}")
+
+    for key in sorted(set(old) & set(new)):
+        o, n = old[key], new[key]
+        o_lat, n_lat = o["latency_ms"], n["latency_ms"]
+        print(
+            f"{key[0]:<15} {key[1]:>4} {o['rps']:>9.1f} {n['rps']:>9.1f} {_delta(o['rps'], n['rps'])}"
+            f" {o_lat['p95']:>9.1f} {n_lat['p95']:>9.1f} {_delta(o_lat['p95'], n_lat['p95'])}"
+            f" {_delta(o_lat['p99'], n_lat['p99'])}"
+            f"   {_delta(o.get('server_ms', {}).get('p50', 0), n.get('server_ms', {}).get('p50', 0))}"
+            f" {_delta(o.get('bytes_mean', 0), n.get('bytes_mean', 0))}"
+        )
+
+    only = sorted(set(old) ^ set(new))
+    if only:
+        print("Есть только в одном из отчётов:", ", ".join(f"{s}@c{c}" for s, c in only))
+
+
+if __name__ == "__main__":
+    main()
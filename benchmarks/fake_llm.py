@@ -0,0 +1,142 @@
+"""
+Локальная заглушка для Ollama и OpenAI, чтобы гонять нагрузку без модели.
+
+Эндпоинты:
+    POST /api/chat              — как Ollama (stream=False)
+    POST /v1/chat/completions   — как OpenAI Chat Completions
+
+Задержка ответа = latency + completion_tokens / token_rate секунд,
+т.е. имитируется и время до первого токена, и скорость генерации.
+
+Запуск отдельно:
+    python -m benchmarks.fake_llm --port 11434 --latency 0.3 --token-rate 40
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ответ на русском, чтобы проходил фильтр кириллицы в /api/assistant
+ANSWER_WORDS = (
+    "Это главный корпус университета, здесь находятся аудитории и "
+    "библиотека, а рядом — студенческое кафе и спортивный зал."
+).split()
+
+
+def _make_text(tokens: int) -> str:
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(max(tokens, 1))]
+    return " ".join(words)
+
+
+def _prompt_tokens(messages) -> int:
+    # Грубая оценка: ~4 символа на токен
+    return sum(len(m.get("content", "")) for m in messages) // 4
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency: float = 0.5, token_rate: float = 50.0,
+                 completion_tokens: int = 60):
+        super().__init__(addr, _Handler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def simulate(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+        delay = self.latency
+        if self.token_rate > 0:
+            delay += self.completion_tokens / self.token_rate
+        time.sleep(delay)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send_json({"error": "bad json"}, 400)
+
+        server: FakeLLMServer = self.server
+        messages = data.get("messages") or []
+        n_out = server.completion_tokens
+        n_in = _prompt_tokens(messages)
+
+        if self.path.rstrip("/") == "/api/chat":
+            server.simulate()
+            return self._send_json({
+                "model": data.get("model"),
+                "message": {"role": "assistant", "content": _make_text(n_out)},
+                "done": True,
+                "prompt_eval_count": n_in,
+                "eval_count": n_out,
+            })
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            server.simulate()
+            return self._send_json({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": data.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": _make_text(n_out)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": n_in,
+                    "completion_tokens": n_out,
+                    "total_tokens": n_in + n_out,
+                },
+            })
+
+        self._send_json({"error": "not found"}, 404)
+
+
+def start_fake_llm(host="127.0.0.1", port=0, **kwargs) -> FakeLLMServer:
+    """Поднимает заглушку в фоновом потоке и возвращает сервер."""
+    server = FakeLLMServer((host, port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заглушка Ollama/OpenAI для нагрузочных тестов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка до ответа, сек")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="токенов в секунду")
+    parser.add_argument("--tokens", type=int, default=60, help="токенов в ответе")
+    args = parser.parse_args()
+
+    srv = FakeLLMServer((args.host, args.port), latency=args.latency,
+                        token_rate=args.token_rate, completion_tokens=args.tokens)
+    print(f"Fake LLM на {srv.base_url} (Ollama: /api/chat, OpenAI: /v1/chat/completions)")
+    srv.serve_forever()
@@ -0,0 +1,336 @@
+"""
+Нагрузочный бенчмарк EduNavigator.
+
+Что делает:
+    1. поднимает заглушку LLM (benchmarks.fake_llm) вместо Ollama и OpenAI;
+    2. создаёт временную базу с тысячами синтетических университетов и
+       большие синтетические туры (benchmarks.seed);
+    3. запускает create_app() на многопоточном werkzeug-сервере;
+    4. для каждого сценария и уровня конкуренции меряет throughput и
+       p50/p95/p99, результат пишет в JSON.
+
+Пример:
+    python -m benchmarks.run --universities 5000 --concurrency 1,8,32 \\
+        --llm-latency 0.3 --token-rate 60 --out bench_output.json
+
+Сравнить два отчёта (до/после изменений):
+    python -m benchmarks.compare old.json new.json
+
+Кэш страниц, req/s до и после:
+    python -m benchmarks.run --scenarios page_home,page_universities,page_3d,page_about \
+        --no-page-cache --out bench_pages_off.json
+    python -m benchmarks.run --scenarios page_home,page_universities,page_3d,page_about \
+        --out bench_pages_on.json
+    python -m benchmarks.compare bench_pages_off.json bench_pages_on.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+import requests
+
+from benchmarks.fake_llm import start_fake_llm
+from benchmarks.seed import CITIES, seed_tours, seed_universities
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Сценарии, которые ходят в LLM — для них отдельное (меньшее) число запросов
+LLM_SCENARIOS = ("assistant", "assistant_mini", "compare_ai")
+PAGE_SCENARIOS = ("page_home", "page_universities", "page_3d", "page_about")
+ALL_SCENARIOS = ("universities", "search", "tour") + PAGE_SCENARIOS + LLM_SCENARIOS
+
+# (method, path, json_body)
+RequestSpec = Tuple[str, str, dict]
+
+
+def build_scenarios(tour_ids: List[str], scenes: int, universities: int) -> Dict[str, Callable]:
+    """Каждый сценарий — функция rnd -> RequestSpec со случайными параметрами."""
+
+    def scene_id(rnd):
+        return f"scene_{rnd.randrange(scenes):04d}"
+
+    def search(rnd):
+        term = rnd.choice((f"{rnd.randrange(100):02d}", rnd.choice(CITIES), "Univ"))
+        return "GET", f"/api/search?q={term}", None
+
+    def assistant(rnd):
+        return "POST", "/api/assistant", {
+            "tour_id": rnd.choice(tour_ids),
+            "current_scene": scene_id(rnd),
+            "message": "Что находится рядом с этой локацией?",
+        }
+
+    def assistant_mini(rnd):
+        return "POST", "/api/assistant", {
+            "tour_id": rnd.choice(tour_ids),
+            "current_scene": scene_id(rnd),
+            "message": "__mini_info__",
+        }
+
+    def compare_ai(rnd):
+        id1, id2 = rnd.sample(range(1, universities + 1), 2)
+        return "POST", "/api/compare_ai", {"id1": id1, "id2": id2, "goal": "IT и стипендия"}
+
+    return {
+        "universities": lambda rnd: ("GET", "/api/universities", None),
+        "search": search,
+        "tour": lambda rnd: ("GET", f"/api/tour/{rnd.choice(tour_ids)}", None),
+        "page_home": lambda rnd: ("GET", "/", None),
+        "page_universities": lambda rnd: ("GET", "/universities", None),
+        "page_3d": lambda rnd: ("GET", "/3d", None),
+        "page_about": lambda rnd: ("GET", "/about", None),
+        "assistant": assistant,
+        "assistant_mini": assistant_mini,
+        "compare_ai": compare_ai,
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank перцентиль по отсортированному списку."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _server_total_ms(header: str):
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name == "total" and params.startswith("dur="):
+            return float(params[4:])
+    return None
+
+
+def run_load(base_url: str, make_request: Callable, total: int, concurrency: int,
+             seed: int = 0) -> dict:
+    """Отправляет total запросов в concurrency потоков и собирает статистику."""
+    local = threading.local()
+    latencies: List[float] = []
+    server_ms: List[float] = []
+    wire_bytes: List[int] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body = make_request(random.Random(seed * 1_000_003 + i))
+
+        start = time.perf_counter()
+        ok = True
+        try:
+            resp = session.request(method, base_url + path, json=body, timeout=300)
+            body = resp.content  # дочитываем тело — это часть задержки
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+                return
+            # Серверное время из Server-Timing — без накладных расходов клиента,
+            # который крутится в том же процессе
+            total = _server_total_ms(resp.headers.get("Server-Timing", ""))
+            if total is not None:
+                server_ms.append(total)
+            wire_bytes.append(int(resp.headers.get("Content-Length") or len(body)))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    server_ms.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(wall, 3),
+        "rps": round((total - errors) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "min": round(ms[0], 2),
+            "mean": round(statistics.fmean(ms), 2),
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(ms[-1], 2),
+        },
+        "server_ms": {
+            "p50": round(percentile(server_ms, 50), 2),
+            "p95": round(percentile(server_ms, 95), 2),
+        },
+        "bytes_mean": round(statistics.fmean(wire_bytes)) if wire_bytes else 0,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк EduNavigator")
+    parser.add_argument("--universities", type=int, default=5000)
+    parser.add_argument("--tours", type=int, default=10)
+    parser.add_argument("--scenes", type=int, default=300, help="сцен в каждом туре")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        help="уровни конкуренции через запятую")
+    parser.add_argument("--requests", type=int, default=400,
+                        help="запросов на уровень для обычных сценариев")
+    parser.add_argument("--llm-requests", type=int, default=64,
+                        help="запросов на уровень для сценариев с LLM")
+    parser.add_argument("--scenarios", default=",".join(ALL_SCENARIOS))
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="задержка LLM, сек")
+    parser.add_argument("--token-rate", type=float, default=60.0, help="токенов в секунду")
+    parser.add_argument("--tokens", type=int, default=60, help="токенов в ответе LLM")
+    parser.add_argument("--warmup", type=int, default=5, help="прогревочных запросов на сценарий")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--keep", action="store_true", help="не удалять временные данные")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="отключить кэш страниц (замер «до»)")
+    parser.add_argument("--admission", action="store_true",
+                        help="включить rate limit и лимит одновременных генераций LLM")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(ALL_SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="edunav-bench-")
+    db_path = os.path.join(workdir, "universities.db")
+    tours_dir = os.path.join(workdir, "tours")
+
+    fake = start_fake_llm(latency=args.llm_latency, token_rate=args.token_rate,
+                          completion_tokens=args.tokens)
+
+    # Переменные окружения должны быть выставлены ДО импорта app / db / ai
+    os.environ.update({
+        "UNIVERSITIES_DB": db_path,
+        "TOURS_DIR": tours_dir,
+        # Очередь задач и лимиты — тоже во временном каталоге, не в db/
+        "JOBS_DB": os.path.join(workdir, "jobs.db"),
+        "RATELIMIT_DB": os.path.join(workdir, "ratelimit.db"),
+        "OLLAMA_URL": fake.base_url + "/api/chat",
+        "OPENAI_BASE_URL": fake.base_url + "/v1",
+        "OPENAI_API_KEY": "bench",
+        "PAGE_CACHE_ENABLED": "0" if args.no_page_cache else "1",
+        # Весь трафик идёт с одного IP — лимиты по умолчанию выключены
+        "RATELIMIT_ENABLED": "1" if args.admission else "0",
+        "LLM_MAX_CONCURRENT": os.environ.get("LLM_MAX_CONCURRENT", "4") if args.admission else "0",
+    })
+    sys.path.insert(0, REPO_DIR)
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    print(f"Seed: {args.universities} университетов, {args.tours} туров × {args.scenes} сцен")
+    seed_universities(db_path, args.universities, seed=args.seed)
+    tour_ids = seed_tours(tours_dir, args.tours, args.scenes, seed=args.seed)
+
+    # На большой базе планы запросов должны идти по индексам
+    from db.database import explain_hot_queries
+
+    query_plans = {}
+    for name, plan, access, ok in explain_hot_queries():
+        query_plans[name] = {"plan": plan, "access": access, "ok": ok}
+        if not ok:
+            print(f"⚠ {name}: {access} или сортировка — {' | '.join(plan)}")
+
+    from app import create_app
+
+    app = create_app()
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    scenarios = build_scenarios(tour_ids, args.scenes, args.universities)
+    results = []
+    try:
+        for name in selected:
+            total = args.llm_requests if name in LLM_SCENARIOS else args.requests
+            if args.warmup:
+                run_load(base_url, scenarios[name], args.warmup, 1, seed=args.seed - 1)
+            for level in levels:
+                stats = run_load(base_url, scenarios[name], total, level, seed=args.seed)
+                stats = {"scenario": name, "concurrency": level, **stats}
+                results.append(stats)
+                lat = stats["latency_ms"]
+                print(
+                    f"{name:<15} c={level:<4} {stats['rps']:>9.1f} req/s  "
+                    f"p50={lat['p50']:>8.1f}ms  p95={lat['p95']:>8.1f}ms  "
+                    f"p99={lat['p99']:>8.1f}ms  server p50={stats['server_ms']['p50']:>7.2f}ms  "
+                    f"{stats['bytes_mean']:>8}B  errors={stats['errors']}"
+                )
+    finally:
+        server.shutdown()
+        fake.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "universities": args.universities,
+                "tours": args.tours,
+                "scenes": args.scenes,
+                "requests": args.requests,
+                "llm_requests": args.llm_requests,
+                "llm_latency": args.llm_latency,
+                "token_rate": args.token_rate,
+                "tokens": args.tokens,
+                "seed": args.seed,
+                "page_cache": not args.no_page_cache,
+                "admission": args.admission,
+            },
+            "llm_calls": fake.calls,
+            "query_plans": query_plans,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчёт: {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
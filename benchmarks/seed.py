@@ -0,0 +1,101 @@
+"""
+Синтетические данные для бенчмарков: тысячи университетов и большие туры.
+
+Пишет только в переданные пути (временная база и папка туров),
+настоящие db/universities.db и data/tours не трогаются.
+"""
+
+import json
+import os
+import random
+import sqlite3
+from typing import List
+
+CITIES = (
+    "Almaty", "Astana", "Shymkent", "Karaganda", "Aktobe", "Taraz",
+    "Pavlodar", "Semey", "Oskemen", "Atyrau", "Kostanay", "Kyzylorda",
+)
+PROGRAMS = (
+    "Computer Science", "Software Engineering", "Data Science", "Economics",
+    "Finance", "Medicine", "Law", "Journalism", "Architecture", "Pedagogy",
+    "Petroleum Engineering", "Agronomy", "International Relations", "Design",
+)
+REVIEWS = (
+    "Сильные преподаватели и современные лаборатории.",
+    "Общежитие далеко от кампуса, но есть автобус.",
+    "Много студенческих клубов и мероприятий.",
+    "Высокая нагрузка, зато хорошая практика.",
+    "Удобное расписание и отзывчивый деканат.",
+)
+
+
+def seed_universities(db_path: str, count: int, seed: int = 42) -> None:
+    """Создаёт таблицу (через db.database.init_db) и заливает count записей."""
+    from db.database import init_db
+
+    init_db()
+
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rating = None if rnd.random() < 0.05 else round(rnd.uniform(4.0, 10.0), 1)
+        rows.append((
+            f"University {i:05d} {rnd.choice(CITIES)}",
+            rnd.choice(CITIES),
+            rnd.choice(("public", "private", "national")),
+            rating,
+            rnd.randrange(600_000, 6_000_000, 50_000),
+            json.dumps(rnd.sample(PROGRAMS, 5), ensure_ascii=False),
+            json.dumps(rnd.sample(["ru", "kz", "en"], rnd.randint(1, 3))),
+            round(rnd.uniform(0, 10), 1),
+            round(rnd.uniform(0.4, 0.98), 2),
+            json.dumps(rnd.sample(REVIEWS, 3), ensure_ascii=False),
+            f"https://example.com/img/{i}.jpg",
+        ))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("DELETE FROM universities")
+        conn.executemany(
+            """
+            INSERT INTO universities (
+                name, city, type, rating, tuition_fee, programs, languages,
+                international_score, employment_rate, reviews, image_url
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def seed_tours(tours_dir: str, count: int, scenes: int, seed: int = 42) -> List[str]:
+    """Генерирует count туров по scenes сцен с хотспотами. Возвращает id туров."""
+    rnd = random.Random(seed)
+    os.makedirs(tours_dir, exist_ok=True)
+
+    tour_ids = []
+    for t in range(count):
+        tour_id = f"bench{t:03d}"
+        scene_ids = [f"scene_{s:04d}" for s in range(scenes)]
+        tour = {
+            "title": f"Benchmark Tour {t}",
+            "startScene": scene_ids[0],
+            "scenes": {},
+        }
+        for idx, sid in enumerate(scene_ids):
+            targets = rnd.sample(scene_ids, min(4, scenes))
+            tour["scenes"][sid] = {
+                "title": f"Локация {idx}",
+                "image": f"{tour_id}_{sid}.jpg",
+                # каждая вторая сцена без описания — её описывает LLM
+                "description": "" if idx % 2 else f"Описание локации {idx}. " * 5,
+                "hotspots": [{"to": to, "text": f"Перейти: {to}"} for to in targets],
+            }
+
+        with open(os.path.join(tours_dir, f"{tour_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(tour, f, ensure_ascii=False)
+        tour_ids.append(tour_id)
+
+    return tour_ids
@@ -0,0 +1,127 @@
+"""
+Конфигурация приложения.
+
+Все значения читаются из переменных окружения (и .env), у каждого есть
+разумное значение по умолчанию. create_app() принимает класс или объект
+конфигурации, по умолчанию — Config.
+"""
+
+import os
+import secrets
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class Config:
+    # ---- SERVER ----
+    DEBUG = _env_bool("FLASK_DEBUG", False)
+    HOST = os.getenv("HOST", "127.0.0.1")
+    PORT = _env_int("PORT", 5000)
+    WORKERS = _env_int("WEB_WORKERS", 2)         # процессы (gunicorn)
+    THREADS = _env_int("WEB_THREADS", 8)         # потоки на процесс
+    # Прогрев туров, шаблонов и БД до приёма трафика
+    PRELOAD = _env_bool("PRELOAD", True)
+    # Общий каталог для склейки /metrics всех воркеров (пусто — метрики
+    # процесса, который ответил; gunicorn.conf.py задаёт каталог сам)
+    METRICS_DIR = os.getenv("METRICS_DIR", "")
+    # Сколько reverse proxy перед приложением (nginx перед gunicorn — 1):
+    # IP клиента берётся из X-Forwarded-For через ProxyFix. 0 — заголовкам
+    # не доверяем, иначе клиент подставит любой IP и обойдёт лимиты
+    TRUSTED_PROXIES = _env_int("TRUSTED_PROXIES", 0)
+    # Подпись cookie сессии. Без SECRET_KEY — случайный на запуск
+    # (сессии живут до перезапуска; с gunicorn preload — общий для воркеров)
+    SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(32)
+
+    # ---- DATA ----
+    TOURS_DIR = os.getenv("TOURS_DIR", os.path.join(BASE_DIR, "data", "tours"))
+    TOUR_CACHE_SIZE = _env_int("TOUR_CACHE_SIZE", 64)
+    # Панорамы сцен; без файла — предупреждение, с TOURS_STRICT — тур не загружается
+    PANORAMAS_DIR = os.getenv("PANORAMAS_DIR", os.path.join(BASE_DIR, "static", "tour", "panoramas"))
+    TOURS_STRICT = _env_bool("TOURS_STRICT", False)
+    # Multires-тайлы панорам (python -m tours.tiles)
+    TILES_DIR = os.getenv("TILES_DIR", os.path.join(BASE_DIR, "static", "tour", "tiles"))
+    TILES_MAX_AGE = _env_int("TILES_MAX_AGE", 365 * 24 * 3600)
+
+    # ---- PAGE CACHE ----
+    # Готовый HTML страниц (/, /universities, /3d, ...) + gzip-версия
+    PAGE_CACHE_ENABLED = _env_bool("PAGE_CACHE_ENABLED", True)
+    PAGE_CACHE_SIZE = _env_int("PAGE_CACHE_SIZE", 32)
+
+    # ---- RATE LIMIT / ADMISSION ----
+    RATELIMIT_ENABLED = _env_bool("RATELIMIT_ENABLED", True)
+    # memory — бакеты и LLM_MAX_CONCURRENT на процесс, sqlite — общий файл
+    # для всех воркеров (gunicorn.conf.py по умолчанию включает sqlite)
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "memory")
+    RATELIMIT_DB = os.getenv("RATELIMIT_DB", os.path.join(BASE_DIR, "db", "ratelimit.db"))
+    # Ключ бюджетов: ip — адрес клиента; session — cookie сессии (много
+    # студентов за одним NAT кампуса). Запрос без cookie считается по IP
+    RATELIMIT_KEY = os.getenv("RATELIMIT_KEY", "ip")
+    # Бюджеты на клиента: запросов в минуту и размер всплеска
+    RATE_API_PER_MIN = _env_int("RATE_API_PER_MIN", 300)
+    RATE_API_BURST = _env_int("RATE_API_BURST", 60)
+    RATE_LLM_PER_MIN = _env_int("RATE_LLM_PER_MIN", 10)
+    RATE_LLM_BURST = _env_int("RATE_LLM_BURST", 3)
+    # Одновременных генераций (0 — без ограничения): всего с sqlite-backend,
+    # на каждый процесс — с memory
+    LLM_MAX_CONCURRENT = _env_int("LLM_MAX_CONCURRENT", 4)
+    # Слот в sqlite-backend, который держатель не вернул (процесс умер),
+    # освобождается через столько секунд. Должен быть больше самой долгой
+    # генерации (таймауты Ollama/OpenAI с ретраями) — create_app() проверяет
+    LLM_SLOT_LEASE = _env_int("LLM_SLOT_LEASE", 300)
+    # Сколько ждать свободный слот, прежде чем ответить 503
+    LLM_QUEUE_TIMEOUT = _env_int("LLM_QUEUE_TIMEOUT", 2)
+    LLM_RETRY_AFTER = _env_int("LLM_RETRY_AFTER", 10)
+
+    # ---- BACKGROUND JOBS (AI-сравнение) ----
+    JOBS_DB = os.getenv("JOBS_DB", os.path.join(BASE_DIR, "db", "jobs.db"))
+    # Потоков-исполнителей на процесс и предел задач в очереди (дальше — 503)
+    JOBS_WORKERS = _env_int("JOBS_WORKERS", 2)
+    JOBS_MAX_PENDING = _env_int("JOBS_MAX_PENDING", 100)
+    # Сколько секунд одинаковый запрос получает уже готовый результат
+    JOBS_RESULT_TTL = _env_int("JOBS_RESULT_TTL", 3600)
+    # Владелец задачи без heartbeat дольше этого считается умершим
+    # (на той же машине смерть процесса видна сразу, по pid)
+    JOBS_STALE_AFTER = _env_int("JOBS_STALE_AFTER", 60)
+    # Максимальная длительность одного SSE-подключения. SSE держит поток
+    # воркера (gthread/waitress) на всё подключение, поэтому страница
+    # сравнения опрашивает статус; SSE — для асинхронных воркеров (gevent)
+    JOBS_SSE_TIMEOUT = _env_int("JOBS_SSE_TIMEOUT", 30)
+
+    # ---- OLLAMA ----
+    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
+    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
+    OLLAMA_TIMEOUT = _env_int("OLLAMA_TIMEOUT", 60)
+    # Размер пула keep-alive соединений к Ollama (на процесс)
+    OLLAMA_POOL_SIZE = _env_int("OLLAMA_POOL_SIZE", 10)
+
+    # ---- OPENAI (AI-сравнение университетов) ----
+    # Без ключа приложение работает, падает только сравнение
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+    # Таймаут одной попытки; все попытки вместе должны уложиться в LLM_SLOT_LEASE
+    OPENAI_TIMEOUT = _env_int("OPENAI_TIMEOUT", 60)
+    OPENAI_MAX_RETRIES = _env_int("OPENAI_MAX_RETRIES", 1)
+
+
+class DevelopmentConfig(Config):
+    """`FLASK_DEBUG=1 python app.py`: debug-режим, старт без прогрева."""
+
+    DEBUG = True
+    PRELOAD = False
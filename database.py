@@ -1,11 +1,17 @@
 # database.py
+"""
+Старый модуль корневой базы universities.db.
+
+Теперь база одна — db/universities.db со схемой из db/migrations.py,
+а этот файл оставлен как обёртка для старых скриптов загрузки данных.
+Перенести данные из старой корневой базы:
+
+    python -m db.migrations import-legacy
+"""
+
 import sqlite3
-import os
-from pathlib import Path
 
-# Абсолютный путь к базе, чтобы не было сюрпризов при запуске из разных мест
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "universities.db"
+from db.database import DB_PATH, init_db as _init_db
 
 
 def get_db():
@@ -20,30 +26,14 @@ def get_db():
 
 def init_db(seed: bool = False):
     """
-    Создаёт базу и таблицу universities, если их нет.
+    Создаёт/обновляет схему (миграции db/migrations.py).
     Если seed=True — заполняет тестовыми данными.
     """
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS universities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            city TEXT NOT NULL,
-            image TEXT,
-            description TEXT
-        )
-        """
-    )
-
-    conn.commit()
+    _init_db()
 
     if seed:
-        seed_sample_data(conn)
+        seed_sample_data()
 
-    conn.close()
     print("✔ База создана / проверена.")
 
 
@@ -60,7 +50,7 @@ def add_university(name: str, city: str, image: str, description: str, conn=None
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO universities (name, city, image, description)
+        INSERT INTO universities (name, city, image_url, description)
         VALUES (?, ?, ?, ?)
         """,
         (name, city, image, description),
@@ -113,5 +103,5 @@ def seed_sample_data(conn=None):
 
 
 if __name__ == "__main__":
-    # Если запустить python database.py — создаст БД и зальёт sample
-    init_db(seed=True)
\ No newline at end of file
+    # Если запустить python database.py — обновит схему и зальёт sample
+    init_db(seed=True)
@@ -5,22 +5,54 @@
     стандартная библиотека (sqlite3, json, os)
 
 Файл БД:
-    db/universities.db  (расположен рядом с этим модулем)
+    db/universities.db  (расположен рядом с этим модулем,
+    переопределяется переменной окружения UNIVERSITIES_DB)
 """
 
 import json
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
 from typing import Any, Dict, Iterable, List, Optional
 
+from db.migrations import migrate
+from monitoring.metrics import observe_db, record_cache
+
 # Путь до файла БД относительно текущего файла
+# (UNIVERSITIES_DB позволяет подменить базу, например для бенчмарков)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "universities.db")
+DB_PATH = os.getenv("UNIVERSITIES_DB", os.path.join(BASE_DIR, "universities.db"))
 
 # Поля, в которых мы ожидаем JSON-строки
 JSON_FIELDS = ("programs", "reviews", "languages")
 
+# ---- HOT QUERIES ----
+# Порядок сортировки совпадает с индексом idx_universities_rating_name
+LIST_SQL = """
+    SELECT id, name, city, rating, image_url
+    FROM universities
+    ORDER BY rating DESC NULLS LAST, name ASC
+"""
+SEARCH_SQL = """
+    SELECT id, name, city, rating, image_url
+    FROM universities
+    WHERE name LIKE ?
+    ORDER BY rating DESC NULLS LAST, name ASC
+    LIMIT ?
+"""
+BY_ID_SQL = "SELECT * FROM universities WHERE id = ?"
+BY_CITY_SQL = """
+    SELECT id, name, city, rating, image_url
+    FROM universities
+    WHERE city = ?
+    ORDER BY rating DESC NULLS LAST, name ASC
+"""
+
+# Кэш списка для UI: limit -> (data_version, result)
+_list_cache: Dict[Optional[int], tuple] = {}
+_list_cache_lock = threading.Lock()
+
 
 @contextmanager
 def get_connection():
@@ -39,27 +71,22 @@ def get_connection():
 
 def init_db() -> None:
     """
-    Создаёт таблицу universities, если её ещё нет.
+    Создаёт/обновляет схему через версионированные миграции (db/migrations.py).
     Вставку данных ты делаешь сам отдельно.
     """
-    ddl = """
-    CREATE TABLE IF NOT EXISTS universities (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        city TEXT,
-        type TEXT,                  -- 'public', 'private' и т.п., можно не заполнять
-        rating REAL,
-        tuition_fee INTEGER,        -- в тенге за год (примерная стоимость)
-        programs TEXT,              -- JSON-массив строк
-        languages TEXT,             -- JSON-массив языков обучения, например ["ru","kz","en"]
-        international_score REAL,   -- 0–10
-        employment_rate REAL,       -- 0–1 или 0–100
-        reviews TEXT,               -- JSON-массив строк
-        image_url TEXT              -- ссылка на фотографию университета
-    );
+    with observe_db("init_db"):
+        migrate(DB_PATH)
+
+
+def get_data_version() -> int:
+    """
+    Версия данных universities: увеличивается триггерами на каждый
+    INSERT/UPDATE/DELETE (в том числе из других процессов).
+    Кэши сравнивают её со своей — дешёвая инвалидация одним запросом.
     """
-    with get_connection() as conn:
-        conn.execute(ddl)
+    with get_connection() as conn, observe_db("get_data_version"):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return row[0] if row else 0
 
 
 def _parse_json_field(value: Optional[str]) -> List[Any]:
@@ -92,8 +119,8 @@ def get_university_by_id(uid: int) -> Optional[Dict[str, Any]]:
     """
     Возвращает один университет по id или None.
     """
-    with get_connection() as conn:
-        cur = conn.execute("SELECT * FROM universities WHERE id = ?", (uid,))
+    with get_connection() as conn, observe_db("get_university_by_id"):
+        cur = conn.execute(BY_ID_SQL, (uid,))
         row = cur.fetchone()
 
     if not row:
@@ -105,16 +132,21 @@ def get_university_by_id(uid: int) -> Optional[Dict[str, Any]]:
 def get_all_universities(limit: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Лёгкий список для UI: только то, что нужно для карточек.
+    Результат кэшируется до изменения data_version — не мутируй его.
     """
-    sql = """
-        SELECT id, name, city, rating, image_url
-        FROM universities
-        ORDER BY rating DESC NULLS LAST, name ASC
-    """
+    version = get_data_version()
+    with _list_cache_lock:
+        cached = _list_cache.get(limit)
+    if cached is not None and cached[0] == version:
+        record_cache("universities", True)
+        return cached[1]
+    record_cache("universities", False)
+
+    sql = LIST_SQL
     if limit is not None:
         sql += f" LIMIT {int(limit)}"
 
-    with get_connection() as conn:
+    with get_connection() as conn, observe_db("get_all_universities"):
         cur = conn.execute(sql)
         rows = cur.fetchall()
 
@@ -125,6 +157,9 @@ def get_all_universities(limit: Optional[int] = None) -> List[Dict[str, Any]]:
         item["img"] = item.get("image_url")
         result.append(item)
 
+    with _list_cache_lock:
+        _list_cache[limit] = (version, result)
+
     return result
 
 
@@ -133,17 +168,8 @@ def search_universities(query: str, limit: int = 10) -> List[Dict[str, Any]]:
     Поиск по названию (LIKE %query%).
     """
     q = f"%{query.strip()}%"
-    with get_connection() as conn:
-        cur = conn.execute(
-            """
-            SELECT id, name, city, rating, image_url
-            FROM universities
-            WHERE name LIKE ?
-            ORDER BY rating DESC NULLS LAST, name ASC
-            LIMIT ?
-            """,
-            (q, limit),
-        )
+    with get_connection() as conn, observe_db("search_universities"):
+        cur = conn.execute(SEARCH_SQL, (q, limit))
         rows = cur.fetchall()
 
     result = []
@@ -167,8 +193,51 @@ def get_universities_by_ids(ids: Iterable[int]) -> List[Dict[str, Any]]:
     placeholders = ",".join("?" for _ in ids)
     sql = f"SELECT * FROM universities WHERE id IN ({placeholders})"
 
-    with get_connection() as conn:
+    with get_connection() as conn, observe_db("get_universities_by_ids"):
         cur = conn.execute(sql, ids)
         rows = cur.fetchall()
 
-    return [_row_to_university(r) for r in rows]
\ No newline at end of file
+    return [_row_to_university(r) for r in rows]
+
+
+def _plan_access(plan: List[str]) -> str:
+    """
+    Как запрос читает universities:
+        seek        — поиск по индексу (SEARCH ...),
+        index scan  — полный проход по индексу (SCAN ... USING ... INDEX),
+        table scan  — полный проход по таблице.
+    """
+    table_lines = [d for d in plan if "universities" in d]
+    if any(d.startswith("SCAN") and "INDEX" not in d for d in table_lines):
+        return "table scan"
+    if any(d.startswith("SCAN") for d in table_lines):
+        return "index scan"
+    return "seek"
+
+
+def explain_hot_queries() -> List[tuple]:
+    """
+    EXPLAIN QUERY PLAN для горячих запросов.
+    Возвращает [(имя, [строки плана], доступ, ok)]: ok — доступ не хуже
+    ожидаемого для этого запроса и нет сортировки во временном B-дереве.
+
+    list и search проходят покрывающий индекс целиком: список отдаёт все
+    строки, а поиск по подстроке (LIKE '%q%') индексом не сужается, зато
+    идёт в порядке выдачи и останавливается на LIMIT.
+    """
+    queries = [
+        ("list", LIST_SQL, (), "index scan"),
+        ("search", SEARCH_SQL, ("%univ%", 10), "index scan"),
+        ("by_id", BY_ID_SQL, (1,), "seek"),
+        ("by_city", BY_CITY_SQL, ("Almaty",), "seek"),
+    ]
+    rank = {"seek": 0, "index scan": 1, "table scan": 2}
+    report = []
+    with get_connection() as conn:
+        for name, sql, params, expected in queries:
+            plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            access = _plan_access(plan)
+            temp_sort = any("TEMP B-TREE" in d for d in plan)
+            ok = rank[access] <= rank[expected] and not temp_sort
+            report.append((name, plan, access, ok))
+    return report
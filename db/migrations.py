@@ -0,0 +1,238 @@
+"""
+Версионированные миграции схемы db/universities.db.
+
+Версия схемы хранится в PRAGMA user_version. Каждая миграция выполняется
+в своей транзакции (BEGIN IMMEDIATE), поэтому несколько воркеров,
+стартующих одновременно, не применят её дважды.
+
+CLI:
+    python -m db.migrations                  — применить миграции, показать версию
+    python -m db.migrations import-legacy    — перенести данные из старой
+                                               корневой universities.db
+    python -m db.migrations check-plans      — EXPLAIN QUERY PLAN горячих запросов
+"""
+
+import os
+import sqlite3
+import sys
+from typing import Callable, List, Tuple
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# ---- MIGRATIONS ----
+def _m001_initial(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS universities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            city TEXT,
+            type TEXT,                  -- 'public', 'private' и т.п., можно не заполнять
+            rating REAL,
+            tuition_fee INTEGER,        -- в тенге за год (примерная стоимость)
+            programs TEXT,              -- JSON-массив строк
+            languages TEXT,             -- JSON-массив языков обучения, например ["ru","kz","en"]
+            international_score REAL,   -- 0–10
+            employment_rate REAL,       -- 0–1 или 0–100
+            reviews TEXT,               -- JSON-массив строк
+            image_url TEXT              -- ссылка на фотографию университета
+        )
+        """
+    )
+
+
+def _m002_description(conn: sqlite3.Connection) -> None:
+    # Поле из старой корневой схемы (database.py)
+    if "description" not in _column_names(conn, "universities"):
+        conn.execute("ALTER TABLE universities ADD COLUMN description TEXT")
+
+
+def _m003_indexes(conn: sqlite3.Connection) -> None:
+    # Покрывающий индекс под ORDER BY rating DESC NULLS LAST, name ASC:
+    # в SQLite NULL меньше любого числа, так что при DESC они и так в конце,
+    # и список/поиск читаются прямо из индекса без сортировки и без таблицы.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_universities_rating_name
+        ON universities (rating DESC, name ASC, city, image_url)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_universities_city
+        ON universities (city, rating DESC, name ASC)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_universities_name_nocase
+        ON universities (name COLLATE NOCASE)
+        """
+    )
+
+
+def _m004_data_version(conn: sqlite3.Connection) -> None:
+    # Счётчик версии данных: растёт на любое изменение universities.
+    # Триггеры работают для всех процессов и даже для правок из DB Browser,
+    # поэтому кэшам достаточно сравнить одно число.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_universities_{event.lower()}_version
+            AFTER {event} ON universities
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+            END
+            """
+        )
+
+
+def _m005_drop_name_nocase(conn: sqlite3.Connection) -> None:
+    # Поиск — подстрока (name LIKE '%q%'), такой индекс он использовать не
+    # может; NOCASE к тому же сравнивает без регистра только латиницу.
+    # Индекс ни одним запросом не читался и лишь замедлял запись.
+    conn.execute("DROP INDEX IF EXISTS idx_universities_name_nocase")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "initial universities table", _m001_initial),
+    (2, "description column from legacy schema", _m002_description),
+    (3, "indexes for rating/city/name queries", _m003_indexes),
+    (4, "data_version counter", _m004_data_version),
+    (5, "drop unused name NOCASE index", _m005_drop_name_nocase),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path: str) -> int:
+    """Применяет недостающие миграции. Возвращает итоговую версию схемы."""
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        # WAL: читатели не блокируются писателями (несколько воркеров)
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        for version, name, apply in MIGRATIONS:
+            if schema_version(conn) >= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Другой процесс мог успеть, пока мы ждали блокировку
+                if schema_version(conn) >= version:
+                    conn.execute("ROLLBACK")
+                    continue
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"✔ Миграция {version}: {name}")
+
+        return schema_version(conn)
+    finally:
+        conn.close()
+
+
+# ---- LEGACY IMPORT ----
+def import_legacy(db_path: str, legacy_path: str) -> int:
+    """
+    Переносит университеты из старой корневой universities.db
+    (name, city, image, description) в общую базу.
+    Совпадение по названию без учёта регистра: существующим записям
+    дописывается только пустое описание, новые — добавляются.
+    Возвращает количество добавленных записей.
+    """
+    if not os.path.exists(legacy_path):
+        raise FileNotFoundError(legacy_path)
+
+    migrate(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        conn.execute("ATTACH DATABASE ? AS legacy", (legacy_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+                UPDATE universities
+                SET description = (
+                    SELECT l.description FROM legacy.universities AS l
+                    WHERE l.name = universities.name COLLATE NOCASE
+                )
+                WHERE description IS NULL
+                  AND EXISTS (
+                    SELECT 1 FROM legacy.universities AS l
+                    WHERE l.name = universities.name COLLATE NOCASE
+                  )
+                """
+            )
+            cur = conn.execute(
+                """
+                INSERT INTO universities (name, city, image_url, description)
+                SELECT l.name, l.city, l.image, l.description
+                FROM legacy.universities AS l
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM universities AS u
+                    WHERE u.name = l.name COLLATE NOCASE
+                )
+                """
+            )
+            added = cur.rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE legacy")
+        return added
+    finally:
+        conn.close()
+
+
+# ---- CLI ----
+def main(argv=None) -> int:
+    from db.database import DB_PATH, explain_hot_queries
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    command = argv[0] if argv else "migrate"
+
+    if command == "migrate":
+        print(f"Схема {DB_PATH}: версия {migrate(DB_PATH)} (последняя {LATEST_VERSION})")
+        return 0
+
+    if command == "import-legacy":
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        legacy = argv[1] if len(argv) > 1 else os.path.join(root, "universities.db")
+        added = import_legacy(DB_PATH, legacy)
+        print(f"✔ Импортировано из {legacy}: {added} новых университетов")
+        return 0
+
+    if command == "check-plans":
+        migrate(DB_PATH)
+        failed = 0
+        for name, plan, access, ok in explain_hot_queries():
+            print(f"{'OK  ' if ok else 'FAIL'} {name} ({access}): {' | '.join(plan)}")
+            failed += not ok
+        return 1 if failed else 0
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Настройки gunicorn (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Параметры берутся из тех же переменных окружения, что и config.Config.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Несколько воркеров: лимиты запросов, LLM_MAX_CONCURRENT и /metrics
+# должны быть общими, а не на процесс. Задаётся до импорта config.
+os.environ.setdefault("RATELIMIT_BACKEND", "sqlite")
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "run", "metrics")
+)
+# На localhost gunicorn слушает только ради reverse proxy перед ним —
+# его X-Forwarded-For и даёт настоящий IP клиента
+if os.getenv("HOST", "127.0.0.1") in ("127.0.0.1", "localhost", "::1"):
+    os.environ.setdefault("TRUSTED_PROXIES", "1")
+
+from config import Config  # noqa: E402
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.WORKERS
+# Потоки нужны: большая часть времени уходит на ожидание LLM (I/O)
+worker_class = "gthread"
+threads = Config.THREADS
+
+# Приложение (и прогрев) создаётся один раз в мастере до fork —
+# воркеры стартуют уже тёплыми.
+preload_app = True
+
+# Ответ модели может идти до OLLAMA_TIMEOUT секунд, плюс запас на ретрай
+timeout = Config.OLLAMA_TIMEOUT * 2 + 10
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
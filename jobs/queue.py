@@ -0,0 +1,394 @@
+"""
+Фоновая очередь задач (сейчас — AI-сравнение университетов).
+
+Задачи хранятся в SQLite (db/jobs.db), выполняются ограниченным пулом
+потоков. Клиент получает id сразу и дальше опрашивает статус или
+подписывается на SSE.
+
+    queued → running → done | failed
+
+Одинаковые задачи (тот же dedup_key) не дублируются: пока первая в
+очереди/в работе или её готовый результат не старше result_ttl,
+возвращается её id.
+
+Несколько воркеров gunicorn могут работать с одной базой. У каждой
+активной задачи есть владелец (host:pid:очередь) — процесс, в чьём пуле она
+стоит или выполняется. Фоновый поток владельца раз в heartbeat_interval
+обновляет heartbeat своих задач. Задача переходит к другому процессу,
+только если владелец мёртв: pid на этой машине не существует или
+heartbeat не обновлялся дольше stale_after. Этим же потоком (и только
+им) выполняется восстановление и чистка старых задач.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Optional, Set, Tuple
+
+from monitoring.metrics import LLM_BUCKETS, REGISTRY
+
+JOBS_QUEUED = REGISTRY.gauge(
+    "edunav_jobs_queued",
+    "Задачи в очереди (последнее значение, прочитанное из jobs.db любым процессом).",
+    multiprocess_mode="latest",
+)
+JOBS_TOTAL = REGISTRY.counter(
+    "edunav_jobs_total",
+    "Завершённые задачи по статусу.",
+    ("kind", "status"),
+)
+JOBS_DEDUPLICATED = REGISTRY.counter(
+    "edunav_jobs_deduplicated_total",
+    "Отправки, которые получили id уже существующей задачи.",
+    ("kind",),
+)
+JOBS_RECOVERED = REGISTRY.counter(
+    "edunav_jobs_recovered_total",
+    "Задачи, забранные у умершего процесса-владельца.",
+)
+JOB_LATENCY = REGISTRY.histogram(
+    "edunav_job_duration_seconds",
+    "Время задачи: wait — в очереди, run — выполнение, total — от отправки до результата.",
+    ("kind", "phase"),
+    buckets=LLM_BUCKETS,
+)
+
+HOSTNAME = socket.gethostname()
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _owner_alive(owner: Optional[str]) -> Optional[bool]:
+    """
+    Жив ли процесс-владелец. None — неизвестно (другая машина, этот же
+    процесс или Windows, где os.kill(pid, 0) завершает процесс) — решает heartbeat.
+    """
+    if not owner or os.name == "nt":
+        return None
+    parts = owner.rsplit(":", 2)
+    if len(parts) != 3 or parts[0] != HOSTNAME or not parts[1].isdigit():
+        return None
+    pid = int(parts[1])
+    if pid == os.getpid():
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    def __init__(self, db_path: str, runners: Dict[str, Callable[[Dict[str, Any]], str]],
+                 workers: int = 2, max_pending: int = 100, result_ttl: float = 3600,
+                 stale_after: float = 60, retention: float = 7 * 24 * 3600,
+                 slot: Optional[Callable[[], ContextManager]] = None):
+        """
+        runners: kind -> функция(payload) -> str (результат задачи).
+        slot: фабрика контекстного менеджера (например, слот LLMGate);
+              задача становится running только после входа в него.
+        """
+        self.db_path = db_path
+        self.runners = runners
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self.retention = retention
+        self.slot = slot or nullcontext
+        self.heartbeat_interval = max(1.0, stale_after / 4)
+        # Отличает очереди одного процесса (например, в тестах) друг от друга
+        self._instance = uuid.uuid4().hex[:8]
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        # Задачи этого процесса: стоят в пуле или выполняются
+        self._owned: Set[str] = set()
+
+        # Схема — через временное соединение: create_app() может выполняться в
+        # мастере gunicorn до fork, а соединение SQLite нельзя переносить в
+        # дочерний процесс. Рабочие соединения открываются лениво в _conn().
+        with closing(sqlite3.connect(db_path, isolation_level=None, timeout=10)) as conn:
+            self._init_schema(conn)
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                dedup_key TEXT,
+                payload TEXT NOT NULL,     -- JSON
+                status TEXT NOT NULL,      -- queued / running / done / failed
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                owner TEXT,                -- host:pid:очередь, которая ведёт задачу
+                heartbeat REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, status);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+            """
+        )
+        # Базы, созданные до появления владельца задач
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, ddl in (("owner", "owner TEXT"), ("heartbeat", "heartbeat REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {ddl}")
+
+    def _owner(self) -> str:
+        return f"{HOSTNAME}:{os.getpid()}:{self._instance}"
+
+    # ---- STORAGE ----
+    def _conn(self) -> sqlite3.Connection:
+        # Своё соединение на поток и процесс: данные threading.local главного
+        # потока копируются при fork вместе с памятью
+        pid = os.getpid()
+        cached = getattr(self._local, "conn", None)
+        if cached is None or cached[0] != pid:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = (pid, conn)
+            return conn
+        return cached[1]
+
+    def _count_queued(self, conn) -> int:
+        n = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        JOBS_QUEUED.set(n)
+        return n
+
+    def _find_reusable(self, conn, dedup_key: str, now: float) -> Optional[sqlite3.Row]:
+        return conn.execute(
+            """
+            SELECT id, status FROM jobs
+            WHERE dedup_key = ?
+              AND (status IN ('queued', 'running')
+                   OR (status = 'done' AND finished >= ?))
+            ORDER BY created DESC
+            LIMIT 1
+            """,
+            (dedup_key, now - self.result_ttl),
+        ).fetchone()
+
+    # ---- EXECUTOR ----
+    def _pool(self) -> ThreadPoolExecutor:
+        # Пул и фоновый поток создаются заново в каждом процессе: потоки не
+        # переживают fork (gunicorn preload_app), а у копии executor'а
+        # осталось бы состояние мастера.
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is not None and self._executor_pid == pid:
+                return self._executor
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="jobs"
+            )
+            self._executor_pid = pid
+            self._owned = set()
+            executor = self._executor
+
+        threading.Thread(target=self._maintenance_loop, name="jobs-maintenance", daemon=True).start()
+        return executor
+
+    def _schedule(self, executor: ThreadPoolExecutor, job_id: str) -> None:
+        with self._lock:
+            self._owned.add(job_id)
+        executor.submit(self._run, job_id)
+
+    def _release(self, job_id: str) -> None:
+        with self._lock:
+            self._owned.discard(job_id)
+
+    def _maintenance_loop(self) -> None:
+        while True:
+            try:
+                self._heartbeat()
+                self._recover()
+            except Exception as exc:
+                print("JOBS MAINTENANCE ERROR:", exc)
+            time.sleep(self.heartbeat_interval)
+
+    def _heartbeat(self) -> None:
+        with self._lock:
+            owned = list(self._owned)
+        if owned:
+            placeholders = ",".join("?" * len(owned))
+            self._conn().execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND id IN ({placeholders})",
+                (time.time(), self._owner(), *owned),
+            )
+
+    def _recover(self) -> None:
+        """Забирает задачи умерших владельцев и чистит старые готовые."""
+        now = time.time()
+        me = self._owner()
+        conn = self._conn()
+        with self._lock:
+            owned = set(self._owned)
+
+        rows = conn.execute(
+            "SELECT id, owner, heartbeat FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+        for row in rows:
+            if row["owner"] == me:
+                # Владелец — мы, но задачи нет в пуле: прежний процесс с тем же pid
+                dead = row["id"] not in owned
+            else:
+                alive = _owner_alive(row["owner"])
+                if alive is None:
+                    alive = (row["heartbeat"] or 0) >= now - self.stale_after
+                dead = not alive
+            if not dead:
+                continue
+
+            taken = conn.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, owner = ?, heartbeat = ? "
+                "WHERE id = ? AND status IN ('queued', 'running') AND owner IS ?",
+                (me, now, row["id"], row["owner"]),
+            ).rowcount
+            if taken:
+                print(f"JOBS: задача {row['id']} забрана у {row['owner']}")
+                JOBS_RECOVERED.inc()
+                self._schedule(self._pool(), row["id"])
+
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+            (now - self.retention,),
+        )
+        self._count_queued(conn)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self._execute(job_id)
+        finally:
+            self._release(job_id)
+
+    def _execute(self, job_id: str) -> None:
+        conn = self._conn()
+        me = self._owner()
+        row = conn.execute(
+            "SELECT kind, payload, created FROM jobs WHERE id = ? AND status = 'queued' AND owner = ?",
+            (job_id, me),
+        ).fetchone()
+        if row is None:
+            return  # задачу уже забрал другой процесс
+        kind = row["kind"]
+
+        try:
+            # Пока задача ждёт слот модели, она остаётся queued: клиент видит
+            # очередь, а edunav_jobs_queued — её настоящую длину
+            with self.slot():
+                started = time.time()
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = 'running', started = ?, heartbeat = ? "
+                    "WHERE id = ? AND status = 'queued' AND owner = ?",
+                    (started, started, job_id, me),
+                ).rowcount
+                if not claimed:
+                    return  # забрали, пока ждали слот; выход из with вернёт слот
+                self._count_queued(conn)
+                JOB_LATENCY.observe(started - row["created"], kind=kind, phase="wait")
+
+                start = time.perf_counter()
+                result = self.runners[kind](json.loads(row["payload"]))
+                status, error = "done", None
+        except Exception as exc:
+            print("JOB ERROR:", job_id, exc)
+            result, status, error = None, "failed", str(exc) or type(exc).__name__
+            start = None
+
+        finished = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ? AND owner = ?",
+            (status, result, error, finished, job_id, me),
+        )
+        if start is not None:
+            JOB_LATENCY.observe(time.perf_counter() - start, kind=kind, phase="run")
+        JOB_LATENCY.observe(finished - row["created"], kind=kind, phase="total")
+        JOBS_TOTAL.inc(kind=kind, status=status)
+
+    # ---- PUBLIC API ----
+    def find(self, kind: str, dedup_key: str) -> Optional[str]:
+        """id активной или недавно завершённой задачи с тем же ключом."""
+        row = self._find_reusable(self._conn(), dedup_key, time.time())
+        if row is None:
+            return None
+        JOBS_DEDUPLICATED.inc(kind=kind)
+        return row["id"]
+
+    def submit(self, kind: str, payload: Dict[str, Any], dedup_key: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Ставит задачу в очередь. Возвращает (job_id, created):
+        created=False — вернули id уже существующей задачи.
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+
+        executor = self._pool()
+        conn = self._conn()
+        now = time.time()
+
+        # В _owned до вставки: иначе _recover() может увидеть «свою» задачу
+        # без записи в пуле и посчитать её брошенной
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._owned.add(job_id)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedup_key:
+                existing = self._find_reusable(conn, dedup_key, now)
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    self._release(job_id)
+                    JOBS_DEDUPLICATED.inc(kind=kind)
+                    return existing["id"], False
+
+            if self._count_queued(conn) >= self.max_pending:
+                raise QueueFull()
+
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, payload, status, created, owner, heartbeat) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, dedup_key, json.dumps(payload, ensure_ascii=False), now, self._owner(), now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            self._release(job_id)
+            raise
+
+        JOBS_QUEUED.inc()
+        self._schedule(executor, job_id)
+        return job_id, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Статус задачи — только чтение. Зависшие задачи подбирает _recover()."""
+        # Запускаем пул и фоновый поток, если процесс ещё ни разу не ставил задачи:
+        # иначе задачи умершего воркера некому было бы восстановить.
+        self._pool()
+        row = self._conn().execute(
+            "SELECT id, kind, status, result, error, created, started, finished FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._executor_pid == os.getpid():
+            executor.shutdown(wait=wait)
@@ -0,0 +1,567 @@
+"""
+Метрики приложения в формате Prometheus (text exposition 0.0.4).
+
+Зависимости:
+    стандартная библиотека (threading, time, bisect)
+
+Что собираем:
+    - количество HTTP-запросов и гистограмму задержек по каждому маршруту;
+    - время SQL-запросов из db.database;
+    - длительность, токены и ошибки вызовов LLM (Ollama и OpenAI);
+    - попадания/промахи кэшей (hit ratio считается в Prometheus).
+
+Подключение: init_metrics(app) внутри create_app(), эндпоинт /metrics.
+Доступ к /metrics — как к /debug/profiles: с localhost или с заголовком
+X-Profile-Token (см. monitoring.profiling).
+
+Несколько процессов (gunicorn): у каждого воркера свой REGISTRY. Если
+задан METRICS_DIR, каждый процесс раз в FLUSH_INTERVAL секунд сбрасывает
+свои значения в METRICS_DIR/<pid>-<случайный id>.json (pid умершего
+воркера ОС может отдать новому — файлы не должны совпасть), а /metrics
+в любом воркере отдаёт сумму по всем файлам — один scrape target на
+весь сервер. Счётчики и гистограммы умерших воркеров продолжают
+суммироваться (до перезапуска сервера), gauge — только живых: pid
+существует и файл обновлялся за последние PROCESS_STALE_AFTER секунд.
+Как склеивать gauge между процессами, задаёт multiprocess_mode
+("sum" или "latest").
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Response, abort, g, request
+
+from monitoring.profiling import profiling_allowed
+
+# Бакеты для HTTP и SQL (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM отвечает долго — отдельные бакеты до 2 минут
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Как часто процесс сбрасывает свои метрики в METRICS_DIR (секунды)
+FLUSH_INTERVAL = 5.0
+# Файл, который не обновлялся дольше, — от умершего процесса
+PROCESS_STALE_AFTER = FLUSH_INTERVAL * 3
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Метрика {self.name} ожидает метки {self.labelnames}, получено {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """Копия значений: ключ из меток -> значение (формат зависит от типа)."""
+        with self._lock:
+            return {k: self._copy(v) for k, v in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def collect(self) -> List[str]:
+        return self.format(self.snapshot())
+
+    def format(self, values: Dict[Tuple[str, ...], Any]) -> List[str]:
+        raise NotImplementedError
+
+    def merge(self, snapshots: List[Tuple[Dict[Tuple[str, ...], Any], bool]]) -> Dict[Tuple[str, ...], Any]:
+        """Склейка снимков нескольких процессов: [(снимок, процесс жив)]."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def format(self, values) -> List[str]:
+        lines = self.header()
+        for key, val in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(val)}")
+        return lines
+
+    def merge(self, snapshots):
+        merged: Dict[Tuple[str, ...], float] = {}
+        for values, _alive in snapshots:
+            for key, val in values.items():
+                merged[key] = merged.get(key, 0.0) + val
+        return merged
+
+
+class Gauge(_Metric):
+    """Значение, которое может расти и уменьшаться (длина очереди и т.п.)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode: str = "sum"):
+        """
+        multiprocess_mode: "sum" — сумма по живым процессам (запросы в работе),
+        "latest" — самое свежее значение (то, что процесс прочитал из общей БД).
+        """
+        super().__init__(name, documentation, labelnames)
+        if multiprocess_mode not in ("sum", "latest"):
+            raise ValueError(f"Неизвестный multiprocess_mode: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+        # key -> [значение, время последнего изменения]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = [float(value), time.time()]
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            current = self._values.get(key, [0.0, 0.0])[0]
+            self._values[key] = [current + amount, time.time()]
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), [0.0])[0]
+
+    def format(self, values) -> List[str]:
+        lines = self.header()
+        for key, (val, _updated) in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(val)}")
+        return lines
+
+    def merge(self, snapshots):
+        merged: Dict[Tuple[str, ...], list] = {}
+        for values, alive in snapshots:
+            if not alive:
+                continue
+            for key, (val, updated) in values.items():
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = [val, updated]
+                elif self.multiprocess_mode == "sum":
+                    merged[key] = [current[0] + val, max(current[1], updated)]
+                elif updated > current[1]:
+                    merged[key] = [val, updated]
+        return merged
+
+
+class Histogram(_Metric):
+    """Гистограмма с кумулятивными бакетами, как в prometheus_client."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [счётчики по бакетам (+Inf последним), сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    def merge(self, snapshots):
+        merged: Dict[Tuple[str, ...], list] = {}
+        for values, _alive in snapshots:
+            for key, (counts, total, n) in values.items():
+                current = merged.get(key)
+                if current is None or len(current[0]) != len(counts):
+                    # Бакеты поменялись между версиями — берём последний снимок
+                    merged[key] = [list(counts), total, n]
+                    continue
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+                current[2] += n
+        return merged
+
+    def format(self, values) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, n) in sorted(values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Registry:
+    """Набор метрик, который отдаётся на /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode="sum") -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def _all(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._all():
+            lines.extend(m.collect())
+        return "\n".join(lines) + "\n"
+
+    # ---- MULTIPROCESS ----
+    def dump(self, directory: str) -> None:
+        """Атомарно записывает значения процесса в directory/<id процесса>.json."""
+        data = {
+            m.name: [[list(key), val] for key, val in m.snapshot().items()]
+            for m in self._all()
+        }
+        path = os.path.join(directory, f"{_process_id()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def render_multiprocess(self, directory: str) -> str:
+        """Сумма метрик всех процессов: свои — из памяти, чужие — из файлов."""
+        own_file = f"{_process_id()}.json"
+        now = time.time()
+        processes: List[Tuple[Dict[str, Any], bool]] = []
+        for filename in os.listdir(directory):
+            pid = _pid_from_filename(filename)
+            if pid is None or filename == own_file:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                alive = _process_alive(pid, path, now)
+                with open(path, "r", encoding="utf-8") as f:
+                    processes.append((json.load(f), alive))
+            except (OSError, ValueError):
+                continue  # файл удалили или он ещё пишется — пропускаем
+
+        lines: List[str] = []
+        for m in self._all():
+            snapshots = [(m.snapshot(), True)]
+            for data, alive in processes:
+                values = {tuple(key): val for key, val in data.get(m.name, [])}
+                snapshots.append((values, alive))
+            lines.extend(m.format(m.merge(snapshots)))
+        return "\n".join(lines) + "\n"
+
+
+_process: Optional[Tuple[int, str]] = None
+
+
+def _process_id() -> str:
+    """<pid>-<случайная часть>, новый в каждом процессе (в том числе после fork)."""
+    global _process
+    pid = os.getpid()
+    if _process is None or _process[0] != pid:
+        _process = (pid, f"{pid}-{uuid.uuid4().hex[:12]}")
+    return _process[1]
+
+
+def _pid_from_filename(filename: str) -> Optional[int]:
+    name, ext = os.path.splitext(filename)
+    pid = name.split("-", 1)[0]
+    return int(pid) if ext == ".json" and pid.isdigit() else None
+
+
+def _process_alive(pid: int, path: str, now: float) -> bool:
+    # Одного pid мало: его мог получить новый воркер. Живой процесс
+    # обновляет свой файл каждые FLUSH_INTERVAL секунд.
+    return _pid_alive(pid) and now - os.path.getmtime(path) < PROCESS_STALE_AFTER
+
+
+def _pid_alive(pid: int) -> bool:
+    # На Windows os.kill(pid, 0) завершает процесс — там gunicorn и нет
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_multiprocess_dir(directory: str) -> None:
+    """Удаляет файлы умерших процессов (прошлый запуск сервера)."""
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    for filename in os.listdir(directory):
+        pid = _pid_from_filename(filename)
+        if pid is None:
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if not _process_alive(pid, path, now):
+                os.remove(path)
+        except OSError:
+            pass
+
+
+REGISTRY = Registry()
+
+# ---- HTTP ----
+HTTP_REQUESTS = REGISTRY.counter(
+    "edunav_http_requests_total",
+    "Количество HTTP-запросов по маршрутам.",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "edunav_http_request_duration_seconds",
+    "Время обработки HTTP-запроса.",
+    ("method", "route"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "edunav_http_requests_in_flight",
+    "Запросы, которые обрабатываются прямо сейчас.",
+)
+
+# ---- DB ----
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    "edunav_db_query_duration_seconds",
+    "Время SQL-запросов из db.database.",
+    ("query",),
+    buckets=DB_BUCKETS,
+)
+DB_ERRORS = REGISTRY.counter(
+    "edunav_db_query_errors_total",
+    "Ошибки SQL-запросов.",
+    ("query",),
+)
+
+# ---- LLM ----
+LLM_LATENCY = REGISTRY.histogram(
+    "edunav_llm_request_duration_seconds",
+    "Длительность вызова модели.",
+    ("provider", "model"),
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = REGISTRY.counter(
+    "edunav_llm_tokens_total",
+    "Токены, которые вернул провайдер (prompt / completion).",
+    ("provider", "model", "kind"),
+)
+LLM_FAILURES = REGISTRY.counter(
+    "edunav_llm_failures_total",
+    "Неудачные вызовы модели.",
+    ("provider", "model", "reason"),
+)
+
+# ---- CACHE ----
+CACHE_REQUESTS = REGISTRY.counter(
+    "edunav_cache_requests_total",
+    "Обращения к кэшам приложения (result=hit|miss).",
+    ("cache", "result"),
+)
+
+
+# ---- HELPERS ----
+@contextmanager
+def observe_db(query: str):
+    """Засекает время SQL-запроса; ошибки считаются отдельно."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_ERRORS.inc(query=query)
+        raise
+    finally:
+        DB_QUERY_LATENCY.observe(time.perf_counter() - start, query=query)
+
+
+def observe_llm(provider: str, model: str, seconds: float,
+                prompt_tokens: Optional[int] = None,
+                completion_tokens: Optional[int] = None) -> None:
+    LLM_LATENCY.observe(seconds, provider=provider, model=model)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, kind="completion")
+
+
+def record_llm_failure(provider: str, model: str, exc: BaseException) -> None:
+    LLM_FAILURES.inc(provider=provider, model=model, reason=type(exc).__name__)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# ========================================================
+#   FLASK INTEGRATION
+# ========================================================
+def _route_label() -> str:
+    # Шаблон маршрута (/api/tour/<tour_id>), а не сырой путь —
+    # иначе кардинальность меток растёт с каждым id.
+    if request.url_rule is not None:
+        return request.url_rule.rule
+    return "<unmatched>"
+
+
+def _start_flusher(registry: Registry, directory: str) -> None:
+    def flush():
+        try:
+            registry.dump(directory)
+        except OSError as exc:
+            print("METRICS FLUSH ERROR:", exc)
+
+    def loop():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            flush()
+
+    # Последние значения — при штатном завершении воркера
+    atexit.register(flush)
+    threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+
+def init_metrics(app, registry: Registry = REGISTRY, multiprocess_dir: str = "") -> None:
+    """
+    Вешает хуки замера запросов и регистрирует /metrics.
+    multiprocess_dir — общий каталог для склейки метрик воркеров (METRICS_DIR).
+    """
+    if multiprocess_dir:
+        cleanup_multiprocess_dir(multiprocess_dir)
+    flusher_pid = [None]
+    flusher_lock = threading.Lock()
+
+    @app.before_request
+    def _metrics_start():
+        # Поток сброса — свой в каждом воркере (потоки не переживают fork)
+        if multiprocess_dir and flusher_pid[0] != os.getpid():
+            with flusher_lock:
+                if flusher_pid[0] != os.getpid():
+                    flusher_pid[0] = os.getpid()
+                    _start_flusher(registry, multiprocess_dir)
+
+        g._metrics_start = time.perf_counter()
+        g._metrics_in_flight = True
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _metrics_record(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = _route_label()
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route)
+            HTTP_REQUESTS.inc(method=request.method, route=route, status=str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        if g.pop("_metrics_in_flight", False):
+            HTTP_IN_FLIGHT.dec()
+
+    @app.get("/metrics")
+    def metrics():
+        if not profiling_allowed():
+            abort(403)
+        if multiprocess_dir:
+            return Response(registry.render_multiprocess(multiprocess_dir), content_type=CONTENT_TYPE)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,155 @@
+"""
+Профилирование отдельных запросов и заголовок Server-Timing.
+
+Зависимости:
+    стандартная библиотека (cProfile, pstats)
+
+Как включить профиль для одного запроса:
+    - заголовок  X-Profile: 1   или   query-параметр ?_profile=1
+    - доступно только с localhost или с заголовком X-Profile-Token,
+      совпадающим с переменной окружения PROFILE_TOKEN.
+
+Результат сохраняется в PROFILE_DIR/<id>.prof (формат pstats, открывается
+snakeviz / python -m pstats), id приходит в заголовке X-Profile-Id,
+текстовая сводка — GET /debug/profiles/<id>.
+
+Server-Timing добавляется ко всем ответам: фазы замеряются через
+server_timing("llm") и т.п. внутри обработчиков, плюс общий total.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+LOCAL_ADDRS = ("127.0.0.1", "::1", "localhost")
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# cProfile в одном процессе одновременно может быть активен только один —
+# параллельные запросы с профилем просто пропускаются.
+_PROFILER_LOCK = threading.Lock()
+
+
+# ---- SERVER-TIMING ----
+@contextmanager
+def server_timing(name: str):
+    """
+    Замер фазы запроса. Повторные замеры с тем же именем суммируются
+    (например, два вызова LLM при ретрае попадают в одну фазу llm).
+    Вне контекста запроса ничего не делает.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            timings = g.setdefault("_server_timings", {})
+            timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start)
+
+
+def _format_server_timing(timings, total: float) -> str:
+    parts = [f"{name};dur={sec * 1000:.2f}" for name, sec in timings.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# ---- ACCESS ----
+def profiling_allowed() -> bool:
+    # За reverse proxy remote_addr всегда локальный — такие запросы
+    # считаем внешними и требуем токен.
+    proxied = "X-Forwarded-For" in request.headers
+    if request.remote_addr in LOCAL_ADDRS and not proxied:
+        return True
+    token = request.headers.get("X-Profile-Token", "")
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _profile_requested() -> bool:
+    flag = request.headers.get("X-Profile") or request.args.get("_profile")
+    return flag in ("1", "true", "yes")
+
+
+def _profile_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+
+
+# ========================================================
+#   FLASK INTEGRATION
+# ========================================================
+def init_profiling(app) -> None:
+    """Хуки профилирования и Server-Timing, плюс /debug/profiles/<id>."""
+
+    @app.before_request
+    def _profiling_start():
+        g._request_start = time.perf_counter()
+
+        # Чужим клиентам флаг молча игнорируется — запрос обрабатывается как обычно
+        if not _profile_requested() or not profiling_allowed():
+            return
+        if not _PROFILER_LOCK.acquire(blocking=False):
+            g._profile_skipped = "busy"
+            return
+
+        profiler = cProfile.Profile()
+        g._profiler = profiler
+        profiler.enable()
+
+    @app.after_request
+    def _profiling_finish(response):
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _PROFILER_LOCK.release()
+
+            profile_id = uuid.uuid4().hex
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(_profile_path(profile_id))
+            response.headers["X-Profile-Id"] = profile_id
+        elif g.get("_profile_skipped"):
+            response.headers["X-Profile-Skipped"] = g._profile_skipped
+
+        start = g.get("_request_start")
+        if start is not None:
+            total = time.perf_counter() - start
+            response.headers["Server-Timing"] = _format_server_timing(
+                g.get("_server_timings", {}), total
+            )
+        return response
+
+    @app.teardown_request
+    def _profiling_cleanup(exc):
+        # after_request не вызывается, если обработчик упал до ответа
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _PROFILER_LOCK.release()
+
+    @app.get("/debug/profiles/<profile_id>")
+    def profile_report(profile_id):
+        if not profiling_allowed():
+            abort(403)
+        path = _profile_path(profile_id)
+        if not PROFILE_ID_RE.match(profile_id) or not os.path.exists(path):
+            abort(404)
+
+        sort = request.args.get("sort", "cumulative")
+        if sort not in ("cumulative", "tottime", "calls", "ncalls"):
+            sort = "cumulative"
+        limit = request.args.get("limit", 40, type=int)
+
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return Response(out.getvalue(), mimetype="text/plain")
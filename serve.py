@@ -0,0 +1,37 @@
+"""
+Продакшен-запуск без gunicorn (в том числе на Windows).
+
+    python serve.py
+
+Использует waitress, если он установлен (pip install waitress),
+иначе — многопоточный werkzeug-сервер без debug-режима.
+Несколько процессов — через gunicorn (см. gunicorn.conf.py).
+"""
+
+from app import create_app
+
+
+def main():
+    app = create_app()
+    host, port = app.config["HOST"], app.config["PORT"]
+    threads = app.config["THREADS"]
+
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve is not None:
+        print(f"✔ waitress на http://{host}:{port} (потоков: {threads})")
+        serve(app, host=host, port=port, threads=threads)
+        return
+
+    from werkzeug.serving import make_server
+
+    print(f"ℹ waitress не установлен — werkzeug на http://{host}:{port}")
+    server = make_server(host, port, app, threaded=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
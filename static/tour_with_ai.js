@@ -8,10 +8,15 @@ async function loadTour(id) {
 
     const scenes = {};
     for (const [sceneId, scene] of Object.entries(tourJson.scenes)) {
+        // Если для панорамы собраны multires-тайлы (python -m tours.tiles) —
+        // грузим куб по уровням, иначе целую equirectangular-картинку
+        const source = scene.multiRes
+            ? { type: "multires", multiRes: scene.multiRes, preview: scene.preview }
+            : { type: "equirectangular", panorama: `/static/tour/panoramas/${scene.image}` };
+
         scenes[sceneId] = {
             title: scene.title,
-            type: "equirectangular",
-            panorama: `/static/tour/panoramas/${scene.image}`,
+            ...source,
             hotSpots: (scene.hotspots || []).map(h => ({
                 pitch: 0,
                 yaw: Math.floor(Math.random()*360),
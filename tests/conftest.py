@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули проекта (db, web, ...) импортируются из корня репозитория,
+# как и при запуске python app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
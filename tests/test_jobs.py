@@ -0,0 +1,46 @@
+"""Фоновая очередь задач: статус задачи, ждущей слот модели."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from jobs.queue import JobQueue
+
+
+def _wait_status(jobs, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"{job_id}: {jobs.get(job_id)['status']} вместо {status}")
+
+
+def test_job_waiting_for_slot_stays_queued(tmp_path):
+    free = threading.Event()
+
+    @contextmanager
+    def slot():
+        free.wait()
+        yield
+
+    jobs = JobQueue(str(tmp_path / "jobs.db"), {"echo": lambda p: p["text"]}, slot=slot)
+    try:
+        job_id, created = jobs.submit("echo", {"text": "ok"})
+        assert created
+
+        time.sleep(0.2)
+        job = jobs.get(job_id)
+        assert job["status"] == "queued"
+        assert job["started"] is None
+        assert jobs._count_queued(jobs._conn()) == 1
+
+        free.set()
+        job = _wait_status(jobs, job_id, "done")
+        assert job["result"] == "ok"
+        assert job["started"] is not None
+        assert jobs._count_queued(jobs._conn()) == 0
+    finally:
+        free.set()
+        jobs.shutdown()
@@ -0,0 +1,54 @@
+"""Склейка метрик воркеров через METRICS_DIR."""
+
+import json
+import os
+import time
+
+from monitoring.metrics import PROCESS_STALE_AFTER, Registry, _process_id
+
+
+def _write_snapshot(directory, name, data, age=0.0):
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def _sample(text, metric):
+    for line in text.splitlines():
+        if line.startswith(metric + " "):
+            return float(line.split()[1])
+    raise AssertionError(f"нет {metric} в выводе")
+
+
+def test_reused_pid_keeps_dead_worker_counters(tmp_path):
+    registry = Registry()
+    requests = registry.counter("test_requests_total", "Запросы.")
+    in_flight = registry.gauge("test_in_flight", "Запросы в работе.")
+    requests.inc(2)
+    in_flight.inc()
+
+    directory = str(tmp_path)
+    registry.dump(directory)
+    assert os.listdir(directory) == [f"{_process_id()}.json"]
+
+    # Умерший воркер с тем же pid, что у нас сейчас (ОС отдала pid заново):
+    # его файл не перезаписан нашим, счётчик суммируется, gauge — нет
+    pid = os.getpid()
+    _write_snapshot(
+        directory,
+        f"{pid}-deadbeef0000",
+        {"test_requests_total": [[[], 5]], "test_in_flight": [[[], [3, time.time()]]]},
+        age=PROCESS_STALE_AFTER * 2,
+    )
+    # Живой соседний воркер
+    _write_snapshot(
+        directory,
+        f"{pid}-0123456789ab",
+        {"test_requests_total": [[[], 1]], "test_in_flight": [[[], [1, time.time()]]]},
+    )
+
+    text = registry.render_multiprocess(directory)
+    assert _sample(text, "test_requests_total") == 8
+    assert _sample(text, "test_in_flight") == 2
@@ -0,0 +1,92 @@
+"""
+EXPLAIN QUERY PLAN горячих запросов и счётчик data_version
+на временной базе после всех миграций.
+
+    python -m pytest tests
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from db import database
+from db.migrations import LATEST_VERSION, migrate
+
+CITIES = ["Almaty", "Astana", "Shymkent", "Karaganda", "Aktobe", "Taraz"]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "universities.db")
+    assert migrate(path) == LATEST_VERSION
+
+    rnd = random.Random(42)
+    rows = [
+        (
+            f"University {i:05d}",
+            rnd.choice(CITIES),
+            None if rnd.random() < 0.05 else round(rnd.uniform(4.0, 10.0), 1),
+            f"https://example.com/img/{i}.jpg",
+        )
+        for i in range(5000)
+    ]
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO universities (name, city, rating, image_url) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("ANALYZE")
+
+    monkeypatch.setattr(database, "DB_PATH", path)
+    # Кэш списка модульный — версия новой базы могла совпасть со старой
+    monkeypatch.setattr(database, "_list_cache", {})
+    return path
+
+
+def test_hot_queries_use_indexes(db_path):
+    report = database.explain_hot_queries()
+    assert [name for name, _, _, _ in report] == ["list", "search", "by_id", "by_city"]
+    for name, plan, access, ok in report:
+        assert ok, f"{name} ({access}): {' | '.join(plan)}"
+        assert access != "table scan", name
+
+
+def test_point_queries_are_seeks(db_path):
+    access = {name: access for name, _, access, _ in database.explain_hot_queries()}
+    assert access["by_id"] == "seek"
+    assert access["by_city"] == "seek"
+
+
+@pytest.mark.parametrize("plan, expected", [
+    (["SEARCH universities USING INTEGER PRIMARY KEY (rowid=?)"], "seek"),
+    (["SCAN universities USING COVERING INDEX idx_universities_rating_name"], "index scan"),
+    (["SCAN universities"], "table scan"),
+    (["SCAN universities", "USE TEMP B-TREE FOR ORDER BY"], "table scan"),
+])
+def test_plan_access(plan, expected):
+    assert database._plan_access(plan) == expected
+
+
+def test_data_version_bumped_by_every_write(db_path):
+    version = database.get_data_version()
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO universities (name, city) VALUES ('New University', 'Almaty')")
+    assert database.get_data_version() == version + 1
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE universities SET rating = 9.9 WHERE name = 'New University'")
+    assert database.get_data_version() == version + 2
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM universities WHERE name = 'New University'")
+    assert database.get_data_version() == version + 3
+
+
+def test_list_cache_follows_data_version(db_path):
+    before = database.get_all_universities()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM universities WHERE id = ?", (before[0]["id"],))
+    after = database.get_all_universities()
+    assert len(after) == len(before) - 1
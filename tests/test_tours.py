@@ -0,0 +1,43 @@
+"""Проверка и компиляция туров (tours.schema)."""
+
+from ai.assistant import build_system_prompt
+from tours.schema import compile_tour, validate_tour
+
+RAW = {
+    "title": "Тестовый кампус",
+    "startScene": "hall",
+    "scenes": {
+        "hall": {"title": "Холл", "image": "hall.jpg",
+                 "hotspots": [{"to": "gym", "text": "В спортзал"}]},
+        "gym": {"title": "Спортзал", "image": "gym.jpg",
+                "hotspots": [{"to": "hall"}, {"to": "lab"}]},
+        "lab": {"title": "Лаборатория", "image": "lab.jpg",
+                "hotspots": [{"to": "hall"}]},
+    },
+}
+
+
+def test_compile_builds_payload_and_incoming_index():
+    tour = compile_tour("test", RAW)
+    assert tour._payload is not None
+    body, etag = tour.payload()
+    assert b'"startScene":"hall"' in body and etag
+
+    assert tour.incoming["hall"] == ("gym", "lab")
+    assert tour.incoming["lab"] == ("gym",)
+
+
+def test_prompt_lists_navigation_for_current_scene():
+    prompt = build_system_prompt(compile_tour("test", RAW), "hall")
+    assert "Отсюда можно пройти: Спортзал" in prompt
+    assert "Сюда можно прийти из: Спортзал, Лаборатория" in prompt
+
+
+def test_validation_errors():
+    broken = dict(RAW, startScene=["hall"])
+    errors, _ = validate_tour(broken)
+    assert "startScene должен быть строкой (id сцены)" in errors
+
+    dangling = {"scenes": {"a": {"image": "a.jpg", "hotspots": [{"to": "b"}]}}}
+    errors, _ = validate_tour(dangling)
+    assert any("нет сцены 'b'" in e for e in errors)
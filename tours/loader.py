@@ -0,0 +1,102 @@
+"""
+Загрузка JSON-туров из data/tours с LRU-кэшем.
+
+Тур перечитывается с диска только если у файла изменился mtime,
+поэтому правка JSON подхватывается без перезапуска сервера.
+При загрузке тур проверяется и компилируется (tours.schema) вместе с
+готовым ответом /api/tour/<id> (с тайлами из tile_manifest);
+тур с ошибками отдаётся как «не найден», ошибки пишутся в лог один раз.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from monitoring.metrics import record_cache
+from tours.schema import CompiledTour, TourInvalid, load_tour
+
+# id тура = имя файла без .json; запрещаем "../" и прочие сюрпризы
+TOUR_ID_RE = re.compile(r"^[\w-]+$")
+
+
+class TourStore:
+    def __init__(self, tours_dir: str, cache_size: int = 64,
+                 panoramas_dir: Optional[str] = None, strict: bool = False,
+                 tile_manifest=None):
+        self.tours_dir = tours_dir
+        self.cache_size = cache_size
+        self.panoramas_dir = panoramas_dir
+        self.strict = strict
+        self.tile_manifest = tile_manifest
+        # tour_id -> (mtime_ns, CompiledTour или None, если тур с ошибками)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, tour_id: str) -> Optional[str]:
+        if not isinstance(tour_id, str) or not TOUR_ID_RE.match(tour_id):
+            return None
+        return os.path.join(self.tours_dir, f"{tour_id}.json")
+
+    def list_ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.tours_dir)
+        except OSError:
+            return []
+        return sorted(f[:-len(".json")] for f in names if f.lower().endswith(".json"))
+
+    def version(self) -> Optional[int]:
+        """mtime папки туров: меняется, когда тур добавили, удалили или переименовали."""
+        try:
+            return os.stat(self.tours_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, tour_id: str) -> Optional[CompiledTour]:
+        """Скомпилированный тур или None, если такого тура нет или он с ошибками."""
+        path = self.path_for(tour_id)
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(tour_id)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(tour_id)
+                record_cache("tour", True)
+                return cached[1]
+
+        record_cache("tour", False)
+        try:
+            tour = load_tour(path, tour_id, self.panoramas_dir, self.strict, self.tile_manifest)
+        except TourInvalid as exc:
+            print(f"✖ Тур {tour_id} с ошибками (python -m tours.schema {tour_id}):")
+            for error in exc.errors:
+                print(f"    {error}")
+            tour = None
+        else:
+            if tour.warnings:
+                print(f"⚠ Тур {tour_id}: предупреждений — {len(tour.warnings)} "
+                      f"(python -m tours.schema {tour_id})")
+
+        with self._lock:
+            self._cache[tour_id] = (mtime, tour)
+            self._cache.move_to_end(tour_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tour
+
+    def warm(self) -> int:
+        """
+        Проверяет и загружает в кэш все туры (не больше cache_size).
+        Возвращает число корректных.
+        """
+        loaded = 0
+        for tour_id in self.list_ids()[: self.cache_size]:
+            if self.get(tour_id) is not None:
+                loaded += 1
+        return loaded
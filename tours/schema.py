@@ -0,0 +1,332 @@
+"""
+Проверка и компиляция JSON-туров.
+
+Тур из data/tours проверяется один раз при загрузке:
+
+    ошибки          — нет scenes, сцена без image, хотспот ведёт в
+                      несуществующую сцену, startScene не найден ...
+    предупреждения  — нет файла панорамы (со strict — ошибка), сцена
+                      недостижима из startScene, хотспот ведёт сам в себя.
+
+Тур с ошибками не отдаётся (404), вместо KeyError в обработчике или
+битого перехода в браузере.
+
+Прошедший проверку тур компилируется в неизменяемый CompiledTour:
+объекты со __slots__, интернированные id сцен, индекс входящих
+хотспотов (откуда можно прийти в сцену — для навигации ИИ-гида) и
+сериализованный ещё при загрузке JSON для клиента (/api/tour/<id>).
+
+    python -m tours.schema              # проверить все туры
+    python -m tours.schema aitu --strict
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOURS_DIR = os.path.join(BASE_DIR, "data", "tours")
+PANORAMAS_DIR = os.path.join(BASE_DIR, "static", "tour", "panoramas")
+
+
+class TourInvalid(ValueError):
+    def __init__(self, tour_id: str, errors: List[str]):
+        super().__init__(f"тур {tour_id}: " + "; ".join(errors))
+        self.tour_id = tour_id
+        self.errors = errors
+
+
+# ========================================================
+#   VALIDATION
+# ========================================================
+def _is_text(value: Any) -> bool:
+    return value is None or isinstance(value, str)
+
+
+def validate_tour(raw: Any, panoramas_dir: Optional[str] = None,
+                  strict: bool = False) -> Tuple[List[str], List[str]]:
+    """
+    Проверяет тур. Возвращает (ошибки, предупреждения).
+    panoramas_dir=None — наличие файлов панорам не проверяется.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    if not isinstance(raw, dict):
+        return ["тур должен быть JSON-объектом"], warnings
+    if not _is_text(raw.get("title")):
+        errors.append("title должен быть строкой")
+
+    scenes = raw.get("scenes")
+    if not isinstance(scenes, dict) or not scenes:
+        errors.append("scenes должен быть непустым объектом")
+        return errors, warnings
+
+    for scene_id, scene in scenes.items():
+        where = f"scenes.{scene_id}"
+        if not scene_id:
+            errors.append("пустой id сцены")
+        if not isinstance(scene, dict):
+            errors.append(f"{where}: сцена должна быть объектом")
+            continue
+        if not _is_text(scene.get("title")):
+            errors.append(f"{where}.title должен быть строкой")
+        if not _is_text(scene.get("description")):
+            errors.append(f"{where}.description должен быть строкой")
+
+        image = scene.get("image")
+        if not isinstance(image, str) or not image:
+            errors.append(f"{where}.image: нет имени файла панорамы")
+        elif os.path.isabs(image) or ".." in image.replace("\\", "/").split("/"):
+            errors.append(f"{where}.image: допускается только путь внутри panoramas ({image})")
+        elif panoramas_dir is not None and not os.path.isfile(os.path.join(panoramas_dir, image)):
+            (errors if strict else warnings).append(f"{where}.image: нет файла {image}")
+
+        hotspots = scene.get("hotspots", [])
+        if not isinstance(hotspots, list):
+            errors.append(f"{where}.hotspots должен быть списком")
+            continue
+        for i, hotspot in enumerate(hotspots):
+            hwhere = f"{where}.hotspots[{i}]"
+            if not isinstance(hotspot, dict):
+                errors.append(f"{hwhere}: хотспот должен быть объектом")
+                continue
+            target = hotspot.get("to")
+            if not isinstance(target, str) or target not in scenes:
+                errors.append(f"{hwhere}.to: нет сцены {target!r}")
+            elif target == scene_id:
+                warnings.append(f"{hwhere}.to: ведёт в ту же сцену")
+            if not _is_text(hotspot.get("text")):
+                errors.append(f"{hwhere}.text должен быть строкой")
+
+    start = raw.get("startScene")
+    if start is None:
+        warnings.append(f"нет startScene — будет первая сцена ({next(iter(scenes))})")
+        start = next(iter(scenes))
+    elif not isinstance(start, str):
+        errors.append("startScene должен быть строкой (id сцены)")
+    elif start not in scenes:
+        errors.append(f"startScene: нет сцены {start!r}")
+
+    if not errors:
+        unreachable = sorted(set(scenes) - _reachable(start, scenes))
+        if unreachable:
+            warnings.append("недостижимы из startScene: " + ", ".join(unreachable))
+
+    return errors, warnings
+
+
+def _reachable(start: str, scenes: Dict[str, Any]) -> set:
+    seen = {start}
+    stack = [start]
+    while stack:
+        for hotspot in scenes[stack.pop()].get("hotspots", []):
+            if hotspot["to"] not in seen:
+                seen.add(hotspot["to"])
+                stack.append(hotspot["to"])
+    return seen
+
+
+# ========================================================
+#   COMPILED REPRESENTATION
+# ========================================================
+class Hotspot:
+    __slots__ = ("to", "text")
+
+    def __init__(self, to: str, text: str):
+        self.to = to
+        self.text = text
+
+
+class Scene:
+    __slots__ = ("id", "title", "description", "image", "hotspots")
+
+    def __init__(self, scene_id: str, title: str, description: str, image: str,
+                 hotspots: Tuple[Hotspot, ...]):
+        self.id = scene_id
+        self.title = title
+        self.description = description
+        self.image = image
+        self.hotspots = hotspots
+
+
+class CompiledTour:
+    """
+    Проверенный тур. Сцены и индексы только для чтения; JSON для клиента
+    сериализуется в compile_tour() и заново — только если сменилась
+    версия manifest.json тайлов.
+    """
+
+    __slots__ = ("id", "title", "start_scene", "scenes", "incoming", "warnings", "_payload")
+
+    def __init__(self, tour_id: str, title: str, start_scene: str,
+                 scenes: Mapping[str, Scene], incoming: Mapping[str, Tuple[str, ...]],
+                 warnings: Tuple[str, ...]):
+        self.id = tour_id
+        self.title = title
+        self.start_scene = start_scene
+        self.scenes = scenes
+        # id сцены -> id сцен, из которых в неё ведут хотспоты
+        self.incoming = incoming
+        self.warnings = warnings
+        self._payload: Optional[Tuple[Any, bytes, str]] = None
+
+    def to_client(self) -> Dict[str, Any]:
+        """Только то, что нужно просмотрщику (static/tour/tour_with_ai.js)."""
+        return {
+            "title": self.title,
+            "startScene": self.start_scene,
+            "scenes": {
+                sid: {
+                    "title": scene.title,
+                    "image": scene.image,
+                    "hotspots": [{"to": h.to, "text": h.text} for h in scene.hotspots],
+                }
+                for sid, scene in self.scenes.items()
+            },
+        }
+
+    def payload(self, tile_manifest=None) -> Tuple[bytes, str]:
+        """(JSON-тело, etag) для /api/tour/<id>, с multiRes, если тайлы собраны."""
+        version = tile_manifest.version if tile_manifest is not None else None
+        cached = self._payload
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        client = self.to_client()
+        if tile_manifest is not None:
+            client = tile_manifest.apply(client)
+        body = json.dumps(client, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        self._payload = (version, body, etag)
+        return body, etag
+
+
+def compile_tour(tour_id: str, raw: Any, panoramas_dir: Optional[str] = None,
+                 strict: bool = False, tile_manifest=None) -> CompiledTour:
+    """
+    Проверяет и компилирует тур; при ошибках бросает TourInvalid.
+    Ответ для клиента (с тайлами из tile_manifest) готовится сразу.
+    """
+    errors, warnings = validate_tour(raw, panoramas_dir, strict)
+    if errors:
+        raise TourInvalid(tour_id, errors)
+
+    raw_scenes = raw["scenes"]
+    start = sys.intern(raw.get("startScene") or next(iter(raw_scenes)))
+
+    scenes: Dict[str, Scene] = {}
+    incoming: Dict[str, List[str]] = {}
+    for scene_id, scene in raw_scenes.items():
+        scene_id = sys.intern(scene_id)
+        hotspots = tuple(
+            Hotspot(sys.intern(h["to"]), h.get("text") or "")
+            for h in scene.get("hotspots", [])
+        )
+        scenes[scene_id] = Scene(
+            scene_id,
+            scene.get("title") or "",
+            (scene.get("description") or "").strip(),
+            scene["image"],
+            hotspots,
+        )
+        for h in hotspots:
+            sources = incoming.setdefault(h.to, [])
+            if scene_id not in sources:
+                sources.append(scene_id)
+
+    tour = CompiledTour(
+        sys.intern(tour_id),
+        raw.get("title") or "",
+        start,
+        MappingProxyType(scenes),
+        MappingProxyType({sid: tuple(src) for sid, src in incoming.items()}),
+        tuple(warnings),
+    )
+    tour.payload(tile_manifest)
+    return tour
+
+
+def load_tour(path: str, tour_id: str, panoramas_dir: Optional[str] = None,
+              strict: bool = False, tile_manifest=None) -> CompiledTour:
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except ValueError as exc:
+            raise TourInvalid(tour_id, [f"некорректный JSON: {exc}"])
+    return compile_tour(tour_id, raw, panoramas_dir, strict, tile_manifest)
+
+
+# ========================================================
+#   CLI
+# ========================================================
+def _measure(path: str, tour_id: str, panoramas_dir: str, strict: bool):
+    """Загрузка с замером: время, память сырого dict и скомпилированного тура."""
+    start = time.perf_counter()
+    tour = load_tour(path, tour_id, panoramas_dir, strict)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    raw_bytes = tracemalloc.get_traced_memory()[0] - base
+    base = tracemalloc.get_traced_memory()[0]
+    compiled = compile_tour(tour_id, raw, panoramas_dir, strict)
+    del raw
+    compiled_bytes = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    return tour, elapsed, raw_bytes, compiled_bytes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка JSON-туров")
+    parser.add_argument("tours", nargs="*", help="id туров (по умолчанию все)")
+    parser.add_argument("--tours-dir", default=TOURS_DIR)
+    parser.add_argument("--panoramas-dir", default=PANORAMAS_DIR)
+    parser.add_argument("--strict", action="store_true",
+                        help="отсутствующие файлы панорам — ошибка, а не предупреждение")
+    args = parser.parse_args(argv)
+
+    tour_ids = args.tours or sorted(
+        f[:-len(".json")] for f in os.listdir(args.tours_dir) if f.lower().endswith(".json")
+    )
+
+    failed = 0
+    print(f"{'tour':<20} {'scenes':>6} {'load ms':>8} {'raw KB':>8} {'compiled KB':>12} {'payload KB':>11}")
+    for tour_id in tour_ids:
+        path = os.path.join(args.tours_dir, f"{tour_id}.json")
+        try:
+            tour, elapsed, raw_bytes, compiled_bytes = _measure(
+                path, tour_id, args.panoramas_dir, args.strict
+            )
+        except OSError as exc:
+            failed += 1
+            print(f"✖ {tour_id}: {exc}")
+            continue
+        except TourInvalid as exc:
+            failed += 1
+            print(f"✖ {tour_id}:")
+            for error in exc.errors:
+                print(f"    {error}")
+            continue
+
+        body, _ = tour.payload()
+        print(f"{tour_id:<20} {len(tour.scenes):>6} {elapsed * 1000:>8.2f}"
+              f" {raw_bytes / 1024:>8.1f} {compiled_bytes / 1024:>12.1f} {len(body) / 1024:>11.1f}")
+        for warning in tour.warnings:
+            print(f"    ⚠ {warning}")
+
+    print(f"Туров: {len(tour_ids)}, с ошибками: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
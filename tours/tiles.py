@@ -0,0 +1,297 @@
+"""
+Офлайн-сборка multires-тайлов Pannellum для панорам туров.
+
+Зависимости (только для сборки, не для сервера):
+    pip install pillow numpy
+
+Для каждой панорамы static/tour/panoramas/<scene.image>:
+    - equirectangular → 6 граней куба (f, r, b, l, u, d);
+    - пирамида уровней с тайлами tile_size×tile_size;
+    - маленькое превью preview.jpg для первого кадра.
+
+Результат лежит в static/tour/tiles/<hash>/, где hash — от содержимого
+исходника и параметров сборки, поэтому файлы можно кэшировать навсегда
+(их отдаёт маршрут /tiles/ с Cache-Control: immutable).
+Соответствие «панорама → тайлы» пишется в static/tour/tiles/manifest.json,
+его читает /api/tour/<id>.
+
+    python -m tours.tiles                 # все туры из data/tours
+    python -m tours.tiles aitu sdu        # только выбранные
+    python -m tours.tiles --tile-size 512 --quality 80
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANORAMAS_DIR = os.path.join(BASE_DIR, "static", "tour", "panoramas")
+TILES_DIR = os.path.join(BASE_DIR, "static", "tour", "tiles")
+MANIFEST_NAME = "manifest.json"
+
+# Порядок и буквы граней — как в generate.py из Pannellum
+FACES = ("f", "b", "u", "d", "l", "r")
+PREVIEW_SIZE = (1024, 512)
+
+# Увеличивается при изменении алгоритма — меняет хэши всех сборок
+BUILD_FORMAT = 1
+
+
+# ========================================================
+#   BUILD
+# ========================================================
+def _face_directions(face: str, size: int, np):
+    """Единичные направления (x вправо, y вверх, z вперёд) для пикселей грани."""
+    coords = (np.arange(size, dtype=np.float32) + 0.5) / size * 2 - 1
+    a, b = np.meshgrid(coords, coords)  # a — по горизонтали, b — вниз
+    one = np.ones_like(a)
+
+    if face == "f":
+        x, y, z = a, -b, one
+    elif face == "r":
+        x, y, z = one, -b, -a
+    elif face == "b":
+        x, y, z = -a, -b, -one
+    elif face == "l":
+        x, y, z = -one, -b, a
+    elif face == "u":
+        x, y, z = a, one, b
+    else:  # "d"
+        x, y, z = a, -one, -b
+    return x, y, z
+
+
+def _project_face(pano, face: str, size: int, np):
+    """Билинейная выборка грани куба из equirectangular-массива (H, W, 3)."""
+    height, width = pano.shape[:2]
+    x, y, z = _face_directions(face, size, np)
+
+    lon = np.arctan2(x, z)
+    lat = np.arctan2(y, np.sqrt(x * x + z * z))
+    u = (lon / (2 * math.pi) + 0.5) * width - 0.5
+    v = (0.5 - lat / math.pi) * height - 0.5
+
+    u0 = np.floor(u).astype(np.int64)
+    v0 = np.floor(v).astype(np.int64)
+    du = (u - u0)[..., None]
+    dv = (v - v0)[..., None]
+
+    # По долготе панорама замкнута, по широте — прижимаем к краю
+    u1 = (u0 + 1) % width
+    u0 = u0 % width
+    v1 = np.clip(v0 + 1, 0, height - 1)
+    v0 = np.clip(v0, 0, height - 1)
+
+    top = pano[v0, u0] * (1 - du) + pano[v0, u1] * du
+    bottom = pano[v1, u0] * (1 - du) + pano[v1, u1] * du
+    return np.clip(top * (1 - dv) + bottom * dv, 0, 255).astype(np.uint8)
+
+
+def _levels(cube_size: int, tile_size: int) -> int:
+    # Та же формула, что в generate.py Pannellum
+    levels = int(math.ceil(math.log(float(cube_size) / tile_size, 2))) + 1
+    if round(cube_size / 2 ** (levels - 2)) == tile_size:
+        levels -= 1
+    return max(levels, 1)
+
+
+def _content_hash(path: str, tile_size: int, quality: int) -> str:
+    digest = hashlib.sha256(f"{BUILD_FORMAT}:{tile_size}:{quality}:".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_panorama(src: str, out_root: str = TILES_DIR, tile_size: int = 512,
+                   quality: int = 80, base_url: str = "/tiles") -> Dict[str, Any]:
+    """
+    Собирает тайлы одной панорамы (или берёт готовые, если хэш совпал).
+    Возвращает запись манифеста: {"hash", "multiRes", "preview"}.
+    """
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as exc:
+        raise RuntimeError("Для сборки тайлов нужны pillow и numpy: pip install pillow numpy") from exc
+
+    content_hash = _content_hash(src, tile_size, quality)
+    out_dir = os.path.join(out_root, content_hash)
+    config_path = os.path.join(out_dir, "config.json")
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    tmp_dir = out_dir + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    with Image.open(src) as img:
+        img = img.convert("RGB")
+        width = img.width
+        preview = img.resize(PREVIEW_SIZE, Image.LANCZOS)
+        preview.save(os.path.join(tmp_dir, "preview.jpg"), quality=70, optimize=True)
+        pano = np.asarray(img, dtype=np.float32)
+
+    # Размер грани ≈ ширина / π, кратно 8
+    cube_size = max(8 * int(width / math.pi / 8), tile_size)
+    levels = _levels(cube_size, tile_size)
+
+    for face in FACES:
+        face_img = Image.fromarray(_project_face(pano, face, cube_size, np))
+        for level in range(levels, 0, -1):
+            size = int(round(cube_size / 2 ** (levels - level)))
+            level_img = face_img if size == cube_size else face_img.resize((size, size), Image.LANCZOS)
+            level_dir = os.path.join(tmp_dir, str(level))
+            os.makedirs(level_dir, exist_ok=True)
+
+            tiles = int(math.ceil(size / tile_size))
+            for ty in range(tiles):
+                for tx in range(tiles):
+                    box = (
+                        tx * tile_size,
+                        ty * tile_size,
+                        min((tx + 1) * tile_size, size),
+                        min((ty + 1) * tile_size, size),
+                    )
+                    level_img.crop(box).save(
+                        os.path.join(level_dir, f"{face}{ty}_{tx}.jpg"),
+                        quality=quality,
+                        optimize=True,
+                    )
+    del pano
+
+    entry = {
+        "hash": content_hash,
+        "multiRes": {
+            "basePath": f"{base_url}/{content_hash}",
+            "path": "/%l/%s%y_%x",
+            "extension": "jpg",
+            "tileResolution": tile_size,
+            "maxLevel": levels,
+            "cubeResolution": cube_size,
+        },
+        "preview": f"{base_url}/{content_hash}/preview.jpg",
+    }
+    with open(os.path.join(tmp_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, indent=2)
+
+    # Каталог появляется целиком или не появляется вовсе
+    os.replace(tmp_dir, out_dir)
+    return entry
+
+
+def build_tours(tours_dir: str, tour_ids=None, panoramas_dir: str = PANORAMAS_DIR,
+                out_root: str = TILES_DIR, **kwargs) -> Dict[str, Any]:
+    """Собирает тайлы для всех панорам туров и обновляет manifest.json."""
+    manifest_path = os.path.join(out_root, MANIFEST_NAME)
+    manifest: Dict[str, Any] = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    if not tour_ids:
+        tour_ids = sorted(f[:-5] for f in os.listdir(tours_dir) if f.endswith(".json"))
+
+    for tour_id in tour_ids:
+        with open(os.path.join(tours_dir, f"{tour_id}.json"), "r", encoding="utf-8") as f:
+            tour = json.load(f)
+        for scene_id, scene in (tour.get("scenes") or {}).items():
+            image = scene.get("image")
+            if not image:
+                continue
+            src = os.path.join(panoramas_dir, image)
+            if not os.path.exists(src):
+                print(f"⚠ {tour_id}/{scene_id}: нет файла {src}")
+                continue
+            entry = build_panorama(src, out_root=out_root, **kwargs)
+            manifest[image] = entry
+            print(f"✔ {tour_id}/{scene_id}: {image} → {entry['hash']} "
+                  f"(уровней: {entry['multiRes']['maxLevel']})")
+
+    os.makedirs(out_root, exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+# ========================================================
+#   RUNTIME
+# ========================================================
+class TileManifest:
+    """
+    manifest.json для сервера: перечитывается, только если файл изменился.
+    Если тайлы не собраны — apply() возвращает тур без изменений и он
+    работает по-старому, с целыми equirectangular-панорамами.
+    """
+
+    def __init__(self, tiles_dir: str = TILES_DIR):
+        self.path = os.path.join(tiles_dir, MANIFEST_NAME)
+        self._mtime: Optional[int] = None
+        self._entries: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        entries: Dict[str, Any] = {}
+        if mtime is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        with self._lock:
+            self._entries, self._mtime = entries, mtime
+
+    @property
+    def version(self) -> Optional[int]:
+        self._refresh()
+        return self._mtime
+
+    def apply(self, tour: Dict[str, Any]) -> Dict[str, Any]:
+        """Копия тура, где у сцен с готовыми тайлами есть multiRes и preview."""
+        self._refresh()
+        if not self._entries:
+            return tour
+
+        scenes = {}
+        for scene_id, scene in (tour.get("scenes") or {}).items():
+            entry = self._entries.get(scene.get("image"))
+            if entry:
+                scene = dict(scene, multiRes=entry["multiRes"], preview=entry["preview"])
+            scenes[scene_id] = scene
+        return dict(tour, scenes=scenes)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Сборка multires-тайлов Pannellum")
+    parser.add_argument("tours", nargs="*", help="id туров (по умолчанию все)")
+    parser.add_argument("--tours-dir", default=os.path.join(BASE_DIR, "data", "tours"))
+    parser.add_argument("--panoramas-dir", default=PANORAMAS_DIR)
+    parser.add_argument("--out", default=TILES_DIR)
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument("--quality", type=int, default=80)
+    args = parser.parse_args(argv)
+
+    build_tours(
+        args.tours_dir,
+        args.tours,
+        panoramas_dir=args.panoramas_dir,
+        out_root=args.out,
+        tile_size=args.tile_size,
+        quality=args.quality,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Кэш отрендеренных HTML-страниц.
+
+Ключ записи — эндпоинт + view_args, а запись действительна, пока не
+изменились mtime шаблона и дополнительные «версии» (data_version БД,
+mtime папки туров и т.п.). Поэтому явно сбрасывать кэш при правке
+шаблона, университетов или туров не нужно — старая запись просто
+перестаёт совпадать.
+
+Тело хранится дважды: как есть и заранее сжатое gzip, плюс ETag
+для ответа 304 без тела.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Optional
+
+from flask import Response, current_app, request
+
+from monitoring.metrics import record_cache
+
+
+class _Entry:
+    __slots__ = ("stamp", "body", "gzipped", "etag", "mimetype")
+
+    def __init__(self, stamp, body: bytes, mimetype: str):
+        self.stamp = stamp
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.mimetype = mimetype
+
+
+class PageCache:
+    def __init__(self, max_entries: int = 32, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key, stamp) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.stamp != stamp:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _respond(entry: _Entry) -> Response:
+        if request.if_none_match.contains(entry.etag):
+            response = Response(status=304)
+        elif "gzip" in request.accept_encodings:
+            response = Response(entry.gzipped, mimetype=entry.mimetype)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(entry.body, mimetype=entry.mimetype)
+
+        response.set_etag(entry.etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def cached(self, template: str, *versions: Callable[[], object]):
+        """
+        Декоратор для view, которая рендерит template.
+        versions — функции, чей результат входит в «штамп» записи
+        (например, get_data_version).
+        """
+
+        def decorator(view):
+            template_path = []
+
+            def template_mtime():
+                if not template_path:
+                    env = current_app.jinja_env
+                    _, filename, _ = env.loader.get_source(env, template)
+                    template_path.append(filename)
+                try:
+                    return os.stat(template_path[0]).st_mtime_ns
+                except OSError:
+                    return None
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != "GET":
+                    return view(*args, **kwargs)
+
+                key = (request.endpoint, tuple(sorted(kwargs.items())))
+                stamp = (template_mtime(),) + tuple(v() for v in versions)
+
+                entry = self._get(key, stamp)
+                record_cache("page", entry is not None)
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    entry = _Entry(stamp, response.get_data(), response.mimetype)
+                    self._put(key, entry)
+
+                return self._respond(entry)
+
+            return wrapper
+
+        return decorator
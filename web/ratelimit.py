@@ -0,0 +1,415 @@
+"""
+Ограничение частоты запросов и допуск к LLM.
+
+Две независимые защиты:
+
+1. Token bucket на клиента (IP или cookie сессии) с отдельными бюджетами:
+       "api" — все /api/* запросы (дешёвые),
+       "llm" — списывается только когда запрос реально идёт в модель.
+   Превышение → 429 + Retry-After.
+
+2. LLMGate — лимит одновременных генераций. Слоты хранятся в том же
+   backend, что и бакеты: MemoryBackend — лимит на процесс,
+   SQLiteBackend — общий на все воркеры (gunicorn.conf.py включает его
+   по умолчанию). Если свободного слота нет дольше queue_timeout
+   секунд — запрос сразу отбрасывается с 503 + Retry-After, а не висит
+   60 секунд. Бюджет "llm" проверяется раньше слота: клиент без бюджета
+   сразу получает 429 и не занимает слот, а токен отброшенного с 503
+   запроса возвращается в бакет.
+   Фоновые задачи (jobs.queue) ждут слот без ограничения: их и так
+   выполняет ограниченный пул.
+
+Ответы, которые не требуют модели (готовые описания сцен, кэш и т.п.),
+не проходят через LLMGate и продолжают отдаваться, даже когда модель
+занята полностью.
+
+Хранилище подключаемое: MemoryBackend (один процесс) или SQLiteBackend
+(общий файл — несколько воркеров на одной машине). Любой объект с
+методами take(key, rate, burst), refund(key, burst),
+acquire_slot(name, limit, timeout, lease) и release_slot(name, token)
+тоже подойдёт.
+"""
+
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import ExitStack, closing, contextmanager
+from typing import Dict, Optional, Tuple
+
+from flask import jsonify, request, session
+
+from monitoring.metrics import REGISTRY
+
+RATE_LIMITED = REGISTRY.counter(
+    "edunav_rate_limited_total",
+    "Запросы, отклонённые token bucket (429).",
+    ("budget",),
+)
+LLM_SHED = REGISTRY.counter(
+    "edunav_llm_shed_total",
+    "Запросы к LLM, отброшенные из-за перегрузки (503).",
+)
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "edunav_llm_in_flight",
+    "Генерации LLM, выполняющиеся прямо сейчас.",
+)
+
+# Как часто ждущий запрос снова пробует взять слот в SQLiteBackend
+SLOT_POLL_INTERVAL = 0.05
+# Раз в CLEANUP_EVERY вызовов take() бакеты, неактивные дольше
+# BUCKET_IDLE_AFTER секунд, удаляются (полный бакет и так по умолчанию)
+CLEANUP_EVERY = 1000
+BUCKET_IDLE_AFTER = 3600
+
+# Id клиента в cookie сессии (RateLimiter с key_by="session")
+SESSION_KEY = "rl_client"
+
+
+class RateLimited(Exception):
+    def __init__(self, budget: str, retry_after: float):
+        super().__init__(f"rate limit exceeded: {budget}")
+        self.budget = budget
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("LLM is overloaded")
+        self.retry_after = retry_after
+
+
+# ========================================================
+#   BACKENDS
+# ========================================================
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _wait_step(deadline: Optional[float]) -> bool:
+    """Пауза перед следующей попыткой взять слот; False — время вышло."""
+    if deadline is None:
+        time.sleep(SLOT_POLL_INTERVAL)
+        return True
+    left = deadline - time.monotonic()
+    if left <= 0:
+        return False
+    time.sleep(min(SLOT_POLL_INTERVAL, left))
+    return True
+
+
+class MemoryBackend:
+    """Бакеты и слоты в памяти процесса."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+
+            self._calls += 1
+            if self._calls % CLEANUP_EVERY == 0:
+                self._cleanup(now)
+
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+    def refund(self, key: str, burst: float) -> None:
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                self._buckets[key] = (min(burst, entry[0] + 1), entry[1])
+
+    def _cleanup(self, now: float) -> None:
+        stale = [
+            k for k, (tokens, updated) in self._buckets.items()
+            if now - updated > BUCKET_IDLE_AFTER
+        ]
+        for k in stale:
+            del self._buckets[k]
+
+    def acquire_slot(self, name: str, limit: int, timeout: Optional[float],
+                     lease: float) -> Optional[object]:
+        # lease не нужен: слоты не переживают свой процесс
+        with self._lock:
+            slots = self._slots.get(name)
+            if slots is None:
+                slots = self._slots[name] = threading.BoundedSemaphore(limit)
+        return slots if slots.acquire(timeout=timeout) else None
+
+    def release_slot(self, name: str, token: object) -> None:
+        token.release()
+
+
+class SQLiteBackend:
+    """
+    Бакеты и слоты в общем SQLite-файле: лимиты действуют на все воркеры
+    сразу. Каждая операция — короткая транзакция BEGIN IMMEDIATE.
+
+    Слот — строка в llm_slots с временем выдачи. Если держатель умер и не
+    вернул слот, тот освобождается сам через lease секунд.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = itertools.count(1)
+        # Временное соединение: backend создаётся в create_app(), возможно в
+        # мастере gunicorn до fork, а соединение SQLite нельзя переносить в
+        # дочерний процесс. Рабочие соединения открываются лениво в _conn().
+        with closing(sqlite3.connect(path, isolation_level=None, timeout=5)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_slots (
+                    token TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    acquired REAL NOT NULL
+                )
+                """
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # Своё соединение на поток и процесс (threading.local копируется при fork)
+        pid = os.getpid()
+        cached = getattr(self._local, "conn", None)
+        if cached is None or cached[0] != pid:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            # Бакеты не жалко потерять при сбое питания — fsync на каждый запрос не нужен
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = (pid, conn)
+            return conn
+        return cached[1]
+
+    def take(self, key: str, rate: float, burst: float) -> Tuple[bool, float]:
+        # time.time(), а не monotonic: время должно совпадать между процессами
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                """
+                INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+                """,
+                (key, tokens, now),
+            )
+            # Счётчик на процесс: с N воркерами чистка в N раз чаще — не страшно
+            if next(self._calls) % CLEANUP_EVERY == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - BUCKET_IDLE_AFTER,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, retry_after
+
+    def refund(self, key: str, burst: float) -> None:
+        self._conn().execute(
+            "UPDATE rate_buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?", (burst, key)
+        )
+
+    def _try_slot(self, name: str, limit: int, lease: float) -> Optional[str]:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM llm_slots WHERE name = ? AND acquired < ?", (name, now - lease))
+            used = conn.execute("SELECT COUNT(*) FROM llm_slots WHERE name = ?", (name,)).fetchone()[0]
+            token = None
+            if used < limit:
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO llm_slots (token, name, acquired) VALUES (?, ?, ?)",
+                    (token, name, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def acquire_slot(self, name: str, limit: int, timeout: Optional[float],
+                     lease: float) -> Optional[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            token = self._try_slot(name, limit, lease)
+            if token is not None:
+                return token
+            if not _wait_step(deadline):
+                return None
+
+    def release_slot(self, name: str, token: str) -> None:
+        self._conn().execute("DELETE FROM llm_slots WHERE token = ?", (token,))
+
+
+def make_backend(name: str, sqlite_path: str = ""):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"Неизвестный backend rate limit: {name}")
+
+
+# ========================================================
+#   LIMITER
+# ========================================================
+class RateLimiter:
+    KEYS = ("ip", "session")
+
+    def __init__(self, backend, budgets: Dict[str, Tuple[float, float]], enabled: bool = True,
+                 key_by: str = "ip"):
+        """
+        budgets: имя -> (запросов в минуту, размер всплеска).
+        key_by: "ip" — бакет на адрес клиента, "session" — на cookie сессии.
+        """
+        if key_by not in self.KEYS:
+            raise ValueError(f"Неизвестный ключ rate limit: {key_by}")
+        self.backend = backend
+        self.budgets = {name: (per_min / 60.0, burst) for name, (per_min, burst) in budgets.items()}
+        self.enabled = enabled
+        self.key_by = key_by
+
+    def client_key(self) -> str:
+        # remote_addr за reverse proxy — это IP клиента только с ProxyFix
+        # (Config.TRUSTED_PROXIES), иначе все клиенты — один бакет
+        if self.key_by == "session":
+            client_id = session.get(SESSION_KEY)
+            if client_id:
+                return f"session:{client_id}"
+            # Новая сессия начинает считаться со следующего запроса, иначе
+            # клиент без cookie получал бы свежий бакет на каждый запрос
+            session[SESSION_KEY] = uuid.uuid4().hex
+        return request.remote_addr or "unknown"
+
+    def check(self, budget: str) -> Optional[str]:
+        """
+        Списывает токен из бюджета текущего клиента или бросает RateLimited.
+        Возвращает ключ бакета для refund() (None — лимиты выключены).
+        """
+        if not self.enabled:
+            return None
+        rate, burst = self.budgets[budget]
+        key = f"{budget}:{self.client_key()}"
+        allowed, retry_after = self.backend.take(key, rate, burst)
+        if not allowed:
+            RATE_LIMITED.inc(budget=budget)
+            raise RateLimited(budget, retry_after)
+        return key
+
+    def refund(self, budget: str, key: Optional[str]) -> None:
+        """Возвращает токен, списанный check(), если запрос так и не выполнился."""
+        if key is not None:
+            self.backend.refund(key, self.budgets[budget][1])
+
+
+class LLMGate:
+    """Ограничение одновременных генераций с быстрым отказом."""
+
+    SLOT_NAME = "llm"
+
+    def __init__(self, backend, max_concurrent: int, queue_timeout: float = 2.0,
+                 retry_after: float = 10.0, lease: float = 300.0):
+        # max_concurrent = 0 — без ограничения
+        self.backend = backend
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.lease = lease
+
+    @contextmanager
+    def slot(self, blocking: bool = False):
+        # blocking=True — ждать слот сколько угодно (фоновые задачи)
+        token = None
+        if self.max_concurrent > 0:
+            timeout = None if blocking else self.queue_timeout
+            token = self.backend.acquire_slot(self.SLOT_NAME, self.max_concurrent, timeout, self.lease)
+            if token is None:
+                LLM_SHED.inc()
+                raise Overloaded(self.retry_after)
+        LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            LLM_IN_FLIGHT.dec()
+            if token is not None:
+                self.backend.release_slot(self.SLOT_NAME, token)
+
+
+# ========================================================
+#   FLASK INTEGRATION
+# ========================================================
+def _error(message: str, status: int, retry_after: float):
+    # "text" — для чата тура (tour_with_ai.js), "error" — для остальных страниц
+    response = jsonify({"error": message, "text": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_ratelimit(app, limiter: RateLimiter, gate: LLMGate):
+    """
+    Бюджет "api" на все /api/*, обработчики 429/503.
+    Возвращает контекстный менеджер llm_guard() для участков с вызовом модели.
+    """
+
+    @app.before_request
+    def _ratelimit_api():
+        if request.path.startswith("/api/"):
+            limiter.check("api")
+
+    @app.errorhandler(RateLimited)
+    def _rate_limited(exc):
+        return _error("Слишком много запросов, подождите немного.", 429, exc.retry_after)
+
+    @app.errorhandler(Overloaded)
+    def _overloaded(exc):
+        return _error("ИИ сейчас перегружен, попробуйте чуть позже.", 503, exc.retry_after)
+
+    @contextmanager
+    def llm_guard():
+        """Бюджет "llm" клиента + слот в LLMGate на время генерации."""
+        # Сначала бюджет: клиент без него получает 429 сразу и не занимает
+        # и не ждёт слот. Отброшенный с 503 запрос токен не тратит.
+        charged = limiter.check("llm")
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(gate.slot())
+            except Overloaded:
+                limiter.refund("llm", charged)
+                raise
+            yield
+
+    app.extensions["rate_limiter"] = limiter
+    app.extensions["llm_gate"] = gate
+    return llm_guard
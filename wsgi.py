@@ -0,0 +1,12 @@
+"""
+WSGI-точка входа для продакшена.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+create_app() с PRELOAD=1 (по умолчанию) прогревает туры, шаблоны и БД
+ещё до того, как воркер начнёт принимать запросы.
+"""
+
+from app import create_app
+
+app = create_app()